@@ -0,0 +1,145 @@
+"""允入控制（admission control）：各類端點的併發上限與過載時的快速回應
+
+單一使用者的大量匯出或整表查詢可能佔滿 SQLAlchemy 連線池，讓所有請求一起卡住。
+這裡以號誌限制同時執行的請求數，額滿時短暫等待（`ADMISSION_QUEUE_TIMEOUT` 秒），
+仍無空位即直接回應，不排隊佔用 worker：
+- 該類端點額滿：`429 Too Many Requests`（由用戶端放慢）
+- 全體額滿（預設等於連線池上限，見 `db.py`）：`503 Service Unavailable`
+兩者皆附 `Retry-After`。端點類別：
+- `search`：`/api/routes/search`、`/api/operators/<name>/routes`
+- `aggregate`：`/api/routes`、統計、抽樣與 `/api/batch`
+- `export`：Excel / CSV 匯出
+
+資料庫端的保護（`statement_timeout`、連線池等待上限）設定於 `db.py`；查詢逾時或
+等不到連線時，`error_status()` 讓端點改回 503。
+
+環境變數：
+- `ADMISSION`：設為 `0` 可停用（預設 1）
+- `ADMISSION_LIMITS`：各類上限，例如 `search=16,aggregate=8,export=2`（未列出者用預設值）
+- `ADMISSION_MAX_CONCURRENT`：全體上限（預設 `DB_POOL_SIZE + DB_MAX_OVERFLOW`）
+- `ADMISSION_QUEUE_TIMEOUT`：額滿時等待空位的秒數（預設 0.25）
+- `ADMISSION_RETRY_AFTER`：`Retry-After` 秒數（預設 1）
+"""
+import functools
+import os
+import threading
+
+from flask import jsonify
+from sqlalchemy import exc as sa_exc
+
+import db
+import metrics
+
+ADMISSION_ENABLED = os.getenv('ADMISSION', '1') == '1'
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '0.25'))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '1'))
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', str(db.DB_POOL_SIZE + db.DB_MAX_OVERFLOW)))
+
+DEFAULT_LIMITS = {'search': 16, 'aggregate': 8, 'export': 2}
+
+# PostgreSQL 取消查詢（statement_timeout）的 SQLSTATE
+QUERY_CANCELED = '57014'
+
+
+def parse_limits(raw):
+    """解析 `search=16,aggregate=8`，回傳含預設值的 {類別: 上限}"""
+    limits = dict(DEFAULT_LIMITS)
+    for item in raw.split(','):
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if not name:
+            continue
+        if name not in limits:
+            raise ValueError(f'ADMISSION_LIMITS 類別不支援：{name}')
+        limits[name] = int(value)
+    return limits
+
+
+ADMISSION_LIMITS = parse_limits(os.getenv('ADMISSION_LIMITS', ''))
+
+
+class Admission:
+    """各類別與全體的併發號誌"""
+
+    def __init__(self, limits=ADMISSION_LIMITS, max_concurrent=ADMISSION_MAX_CONCURRENT,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.limits = dict(limits)
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._groups = {name: threading.BoundedSemaphore(n) for name, n in self.limits.items()}
+        self._total = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_use = {name: 0 for name in self.limits}
+        self.rejected = {name: {'429': 0, '503': 0} for name in self.limits}
+
+    def acquire(self, group):
+        """取得執行名額；回傳 None 表示成功，否則為應回應的狀態碼（429 / 503）"""
+        if not self._groups[group].acquire(timeout=self.queue_timeout):
+            return self._reject(group, 429)
+        if not self._total.acquire(timeout=self.queue_timeout):
+            self._groups[group].release()
+            return self._reject(group, 503)
+        with self._lock:
+            self.in_use[group] += 1
+        return None
+
+    def release(self, group):
+        with self._lock:
+            self.in_use[group] -= 1
+        self._total.release()
+        self._groups[group].release()
+
+    def _reject(self, group, status):
+        with self._lock:
+            self.rejected[group][str(status)] += 1
+        metrics.ADMISSION_REJECTED.inc(metrics.current_endpoint(), group, str(status))
+        return status
+
+    def status(self):
+        with self._lock:
+            return {
+                'enabled': ADMISSION_ENABLED,
+                'max_concurrent': self.max_concurrent,
+                'groups': {
+                    name: {'limit': self.limits[name], 'in_use': self.in_use[name],
+                           'rejected': dict(self.rejected[name])}
+                    for name in self.limits
+                },
+            }
+
+    def limit(self, group):
+        """端點裝飾器：額滿時回應 429 / 503 與 Retry-After，不執行端點"""
+        if group not in self._groups:
+            raise ValueError(f'未定義的端點類別：{group}')
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not ADMISSION_ENABLED:
+                    return view(*args, **kwargs)
+                status = self.acquire(group)
+                if status is not None:
+                    message = '請求過多，請稍後再試' if status == 429 else '服務忙碌中，請稍後再試'
+                    return overloaded_response(message, status)
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    self.release(group)
+            return wrapper
+        return decorator
+
+
+def overloaded_response(message, status=503, error_type='Overloaded'):
+    response = jsonify({'success': False, 'error': message, 'error_type': error_type})
+    response.status_code = status
+    response.headers['Retry-After'] = str(ADMISSION_RETRY_AFTER)
+    return response
+
+
+def error_status(e):
+    """資料庫過載類例外對應的狀態碼：等不到連線或查詢逾時為 503，其餘為 None"""
+    if isinstance(e, sa_exc.TimeoutError):
+        return 503
+    if isinstance(e, sa_exc.DBAPIError) and getattr(e.orig, 'pgcode', None) == QUERY_CANCELED:
+        return 503
+    return None
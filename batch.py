@@ -0,0 +1,257 @@
+"""批次查詢（`POST /api/batch`）
+
+報表腳本常一次送出數十個 `/api/routes/search`（每個監理所 × 路線類型一個），每個請求
+各自付出 HTTP、連線池借還與一次 COUNT 的成本。這裡一次接受多個查詢規格，在同一條
+連線上執行並盡量合併：
+- 總筆數：所有不需分面的搜尋合併為一個陳述式（每個條件一個 COUNT 子查詢，條件相同
+  者只算一次），各子查詢仍走 (district, route_type, 路線編號) 索引
+- 分面（facets）：搜尋字詞相同者共用一次 `GROUP BY district, route_type, 路線性質`，
+  各搜尋的總筆數與分面筆數都由這份分組計數加總
+- 分頁資料：投影欄位相同的搜尋以 UNION ALL 合併為一個陳述式，每段標記所屬查詢
+- 彙整（statistics、detailed_statistics）：同類只查一次；sample_table 由抽樣引擎的
+  直方圖快取試算
+
+啟用記憶體快照時搜尋與彙整改由快照回應，不查詢資料庫。
+"""
+import os
+
+from sqlalchemy import text
+
+import queries
+
+MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', '100'))
+
+QUERY_TYPES = ('search', 'statistics', 'detailed_statistics', 'sample_table')
+
+# 分組計數的欄位，涵蓋搜尋條件（district、route_type）與分面欄位
+GROUP_FIELDS = ['district', 'route_type', '路線性質']
+GROUP_COLUMNS_SQL = 'district, route_type, "路線性質"'
+
+
+def _as_args(spec):
+    """把 JSON 規格轉為與查詢字串相同的字串對照，沿用各端點的參數解析"""
+    args = {}
+    for key, value in spec.items():
+        if isinstance(value, bool):
+            value = '1' if value else '0'
+        elif isinstance(value, (list, tuple)):
+            value = ','.join(str(v) for v in value)
+        elif value is None:
+            value = ''
+        args[key] = str(value)
+    return args
+
+
+def _parse_search(args):
+    search = queries.parse_search_args(args)
+    search['fields'] = queries.parse_fields(args, queries.SEARCH_DEFAULT_FIELDS)
+    search['format'] = queries.parse_format(args)
+    search['facets'] = queries.parse_facets(args)
+    return search
+
+
+def parse_batch(body):
+    """解析 {"queries": [{"type": ..., "id": ..., 其餘同各端點參數}, ...]}
+
+    回傳 [{'id', 'type', 'args'}]；任一規格不合法時拋出 InvalidParameter（指出第幾個）。
+    """
+    specs = body.get('queries') if isinstance(body, dict) else None
+    if not isinstance(specs, list) or not specs:
+        raise queries.InvalidParameter('請以 JSON 傳入 {"queries": [...]}')
+    if len(specs) > MAX_QUERIES:
+        raise queries.InvalidParameter(f'queries 最多 {MAX_QUERIES} 個')
+
+    parsed = []
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            raise queries.InvalidParameter(f'第 {i} 個查詢須為物件')
+        kind = spec.get('type', 'search')
+        if kind not in QUERY_TYPES:
+            raise queries.InvalidParameter(f'第 {i} 個查詢類型不支援：{kind}')
+        args = _as_args(spec)
+        try:
+            if kind == 'search':
+                parsed_args = _parse_search(args)
+            elif kind == 'sample_table':
+                import sampling
+                parsed_args = sampling.parse_plan(args)
+            else:
+                parsed_args = None
+        except ValueError as e:
+            raise queries.InvalidParameter(f'第 {i} 個查詢：{e}') from e
+        parsed.append({'id': spec.get('id', i), 'type': kind, 'args': parsed_args})
+    return parsed
+
+
+# ---- 合併的 SQL ----
+
+def group_counts_sql(where_clause):
+    return f"""
+        SELECT {GROUP_COLUMNS_SQL}, COUNT(*)
+        FROM dmv_routes_2025
+        {where_clause}
+        GROUP BY {GROUP_COLUMNS_SQL}
+    """
+
+
+def counts_sql(where_clauses):
+    """多個 COUNT 合併為一列；where_clauses 的參數名稱須各自加上前綴"""
+    return 'SELECT ' + ',\n        '.join(
+        f'(SELECT COUNT(*) FROM dmv_routes_2025 {where_clause})' for where_clause in where_clauses)
+
+
+def pages_sql(parts):
+    """合併投影欄位相同的分頁查詢；parts 為 [(查詢序號, where_clause, fields)]，
+    where_clause 的參數名稱已加上 q<序號>_ 前綴
+
+    每段保留與 search_data_sql 相同的 ORDER BY ... LIMIT/OFFSET，外層再依查詢序號與
+    排序欄位排列，各段的資料列順序不受 UNION ALL 影響。
+    """
+    fields = parts[0][2]
+    selects = []
+    for index, where_clause, _ in parts:
+        selects.append(f"""
+        SELECT {index} AS batch_query, b{index}.* FROM (
+            SELECT
+                {queries.select_list(fields, queries.SEARCH_FIELD_SQL)},
+                district AS batch_k1, route_type AS batch_k2, "路線編號" AS batch_k3
+            FROM dmv_routes_2025
+            {where_clause}
+            ORDER BY district, route_type, "路線編號"
+            LIMIT :q{index}_per_page OFFSET :q{index}_offset
+        ) b{index}""")
+    return '\n        UNION ALL'.join(selects) + '\n        ORDER BY batch_query, batch_k1, batch_k2, batch_k3'
+
+
+def summarize_groups(groups, district, route_type):
+    """由分組計數加總出某一搜尋的總筆數與各分面筆數"""
+    total = 0
+    counts = {name: {} for name in queries.FACET_FIELDS}
+    for key, count in groups:
+        if district and key[0] != district:
+            continue
+        if route_type and key[1] != route_type:
+            continue
+        total += count
+        for name in queries.FACET_FIELDS:
+            value = key[GROUP_FIELDS.index(name)]
+            counts[name][value] = counts[name].get(value, 0) + count
+    return total, {name: queries.sort_facet_counts(values) for name, values in counts.items()}
+
+
+def _search_result(search, rows, total, facets):
+    payload = queries.build_search_payload(
+        queries.encode_routes(search['fields'], rows, search['format']),
+        total, search['page'], search['per_page'])
+    payload.update({'fields': search['fields'], 'format': search['format']})
+    if search['facets']:
+        payload['facets'] = facets
+    return payload
+
+
+# ---- 執行 ----
+
+def _run_searches_db(conn, searches, like):
+    """searches 為 [(結果序號, 搜尋參數)]，回傳 {結果序號: payload} 與執行的陳述式數"""
+    statements = 0
+
+    # 分面：依搜尋字詞分組，每組一次 GROUP BY
+    groups_by_term = {}
+    for _, search in searches:
+        term = search['search_term']
+        if search['facets'] and term not in groups_by_term:
+            where_clause, params = queries.build_search_where('', '', term, like=like)
+            rows = conn.execute(text(group_counts_sql(where_clause)), params)
+            groups_by_term[term] = [(tuple(row[:-1]), int(row[-1])) for row in rows]
+            statements += 1
+
+    # 其餘搜尋的總筆數：相同條件只算一次，全部合併為一個陳述式
+    count_keys = {}
+    for _, search in searches:
+        if not search['facets']:
+            count_keys.setdefault((search['district'], search['route_type'], search['search_term']), len(count_keys))
+    totals = {}
+    if count_keys:
+        where_clauses, params = [], {}
+        for key, n in count_keys.items():
+            where_clause, where_params = queries.build_search_where(*key, like=like, prefix=f'c{n}_')
+            where_clauses.append(where_clause)
+            params.update(where_params)
+        row = conn.execute(text(counts_sql(where_clauses)), params).fetchone()
+        totals = {key: int(row[n]) for key, n in count_keys.items()}
+        statements += 1
+
+    # 分頁資料：依投影欄位分組，每組一個 UNION ALL
+    parts_by_fields = {}
+    params = {}
+    for index, search in searches:
+        prefix = f'q{index}_'
+        where_clause, where_params = queries.build_search_where(
+            search['district'], search['route_type'], search['search_term'], like=like, prefix=prefix)
+        params.update(where_params)
+        params[prefix + 'per_page'] = search['per_page']
+        params[prefix + 'offset'] = (search['page'] - 1) * search['per_page']
+        parts_by_fields.setdefault(tuple(search['fields']), []).append((index, where_clause, search['fields']))
+
+    rows_by_query = {index: [] for index, _ in searches}
+    for parts in parts_by_fields.values():
+        for row in conn.execute(text(pages_sql(parts)), params):
+            rows_by_query[row[0]].append(row[1:-3])
+        statements += 1
+
+    results = {}
+    for index, search in searches:
+        if search['facets']:
+            total, facets = summarize_groups(groups_by_term[search['search_term']],
+                                             search['district'], search['route_type'])
+        else:
+            total, facets = totals[(search['district'], search['route_type'], search['search_term'])], None
+        results[index] = _search_result(search, rows_by_query[index], total, facets)
+    return results, statements
+
+
+def run(specs, get_engine, snapshot=None, get_sampler=None):
+    """執行 parse_batch 的結果，回傳 (各查詢結果（依傳入順序）, 資料庫陳述式數)"""
+    results = {}
+    statements = 0
+    searches = [(i, spec['args']) for i, spec in enumerate(specs) if spec['type'] == 'search']
+    kinds = {spec['type'] for spec in specs}
+
+    if snapshot is not None:
+        snap = snapshot.get()
+        for index, search in searches:
+            rows, total, facets = snap.search(search['district'], search['route_type'], search['search_term'],
+                                              search['page'], search['per_page'], search['fields'], search['facets'])
+            results[index] = _search_result(search, rows, total, facets)
+        aggregates = {
+            'statistics': lambda: snap.statistics,
+            'detailed_statistics': lambda: snap.detailed_statistics,
+        }
+    else:
+        aggregates = {}
+        if searches or kinds & {'statistics', 'detailed_statistics'}:
+            # 整批只取得一次 engine（設定唯讀副本時即一個副本）
+            engine = get_engine()
+            with engine.connect() as conn:
+                if searches:
+                    found, statements = _run_searches_db(conn, searches, queries.like_operator(engine.dialect.name))
+                    results.update(found)
+                if 'statistics' in kinds:
+                    stats = conn.execute(text(queries.STATISTICS_SQL)).fetchall()
+                    total_companies = conn.execute(text(queries.TOTAL_COMPANIES_SQL)).fetchone()[0]
+                    statistics = queries.build_statistics(stats, total_companies)
+                    aggregates['statistics'] = lambda: statistics
+                    statements += 2
+                if 'detailed_statistics' in kinds:
+                    detailed = queries.build_detailed_statistics(
+                        conn.execute(text(queries.DETAILED_STATISTICS_SQL)).fetchall())
+                    aggregates['detailed_statistics'] = lambda: detailed
+                    statements += 1
+
+    for i, spec in enumerate(specs):
+        if spec['type'] == 'sample_table':
+            results[i] = get_sampler().sample_table(spec['args'])
+        elif spec['type'] != 'search':
+            results[i] = aggregates[spec['type']]()
+
+    return [dict(results[i], id=spec['id'], type=spec['type']) for i, spec in enumerate(specs)], statements
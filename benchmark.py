@@ -0,0 +1,230 @@
+"""效能基準測試
+
+以 `synthetic_data.py` 產生 10×、100×、1000× 規模的資料，量測：
+- `app.py` 每個 API 端點與兩個 Excel 匯出（Flask test client，行程內呼叫，不含網路）
+- 匯入程式各階段（讀取 xlsx、欄名清理與標準化、資料清理、寫入資料庫）
+- 整批載入資料表的時間
+
+結果輸出為 JSON（含 git commit），可用 `--compare` 比較兩次結果。
+
+用法：
+    python benchmark.py --dsn sqlite:///bench.db --scales 10,100 --output bench_results.json
+    python benchmark.py --dsn postgresql+psycopg2://postgres:密碼@localhost:5432/bench
+    python benchmark.py --compare bench_base.json bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ENDPOINTS = [
+    '/api/routes',
+    '/api/routes?limit=5000',
+    '/api/routes?limit=5000&format=columnar',
+    '/api/routes/search?district=taichung&route_type=local_routes',
+    '/api/routes/search?search=%E5%AE%A2%E9%81%8B&page=3',
+    '/api/statistics',
+    '/api/detailed-statistics',
+    '/api/sample-table',
+    '/export/detailed-statistics.xlsx',
+    '/export/sample-table.xlsx',
+]
+
+IMPORTER_STAGES = ['read_excel', 'normalize_columns', 'clean_dataframe',
+                   'add_tracking_columns', 'create_table', 'resolve_companies', 'insert',
+                   'route_operators', 'create_indexes']
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'runs': len(ordered),
+    }
+
+
+def bench_endpoints(client, repeat):
+    results = {}
+    for url in ENDPOINTS:
+        client.get(url, headers={'Accept-Encoding': 'gzip'})  # 暖機
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+            body = response.get_data()
+            samples.append(time.perf_counter() - start)
+        results[f'GET {url}'] = dict(summarize(samples), status=response.status_code, bytes=len(body))
+        print(f'    {url:<60} {results[f"GET {url}"]["median_ms"]:>10.2f} ms')
+    return results
+
+
+def bench_importer(importer, paths, engine):
+    """逐檔執行匯入各階段並累計耗時"""
+    totals = dict.fromkeys(IMPORTER_STAGES, 0.0)
+    rows = 0
+    table_created = False
+    companies = importer.CompanyRegistry()
+    for path in paths:
+        file = os.path.basename(path)
+        district_en, route_type = importer.detect_file_meta(file)
+
+        def timed(stage, fn, *args):
+            start = time.perf_counter()
+            value = fn(*args)
+            totals[stage] += time.perf_counter() - start
+            return value
+
+        df = timed('read_excel', importer.read_workbook, path)
+        df, _ = timed('normalize_columns', importer.normalize_headers, df, file)
+        df = timed('clean_dataframe', importer.clean_dataframe, df)
+        df = timed('add_tracking_columns', importer.add_tracking_columns,
+                   df, district_en, route_type, file, '2025-09-19 09:55:00+0800')
+        if not table_created:
+            timed('create_table', importer.create_table_with_proper_types, df, importer.TARGET_TABLE, engine)
+            table_created = True
+
+        def resolve_companies(df):
+            df = companies.assign(df)
+            companies.flush(engine)
+            return df
+
+        df = timed('resolve_companies', resolve_companies, df)
+        timed('insert', importer.insert_dataframe, df, file, engine)
+        rows += len(df)
+
+    start = time.perf_counter()
+    importer.build_route_operators(engine, companies)
+    totals['route_operators'] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    importer.create_indexes(engine, importer.TARGET_TABLE)
+    totals['create_indexes'] += time.perf_counter() - start
+
+    total = sum(totals.values())
+    return {
+        'files': len(paths),
+        'rows': rows,
+        'total_seconds': round(total, 4),
+        'rows_per_second': round(rows / total, 1) if total else None,
+        'stages_seconds': {k: round(v, 4) for k, v in totals.items()},
+    }
+
+
+def run(args):
+    # app.py 於載入時讀取環境變數，需在 import 前設定
+    os.environ['PG_DSN'] = args.dsn
+    os.environ.setdefault('HTTP_CACHE', '0')
+    os.environ.setdefault('SKIP_DB', '1')
+
+    import app as app_module
+    import db
+    import synthetic_data
+
+    engine = db.get_engine()
+    client = app_module.app.test_client()
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().astimezone().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'dialect': engine.dialect.name,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'scales': {},
+    }
+
+    import_scales = {int(s) for s in args.import_scales.split(',') if s}
+    for scale in [int(s) for s in args.scales.split(',') if s]:
+        print(f'== scale {scale}x')
+        df = synthetic_data.generate_routes(scale, seed=args.seed)
+        entry = {'rows': len(df)}
+
+        if scale in import_scales:
+            folder = os.path.join(args.workdir, f'{scale}x')
+            paths = synthetic_data.write_workbooks(df, folder)
+            entry['importer'] = bench_importer(synthetic_data.importer, paths, engine)
+            print(f'    importer: {entry["importer"]["total_seconds"]:.2f} s '
+                  f'({entry["importer"]["rows_per_second"]} rows/s)')
+
+        start = time.perf_counter()
+        synthetic_data.load_table(engine, df)
+        entry['bulk_load_seconds'] = round(time.perf_counter() - start, 4)
+        app_module.generation.invalidate()
+
+        entry['endpoints'] = bench_endpoints(client, args.repeat)
+        results['scales'][str(scale)] = entry
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f'結果已寫入 {args.output}')
+
+
+def compare(base_path, new_path):
+    """比較兩份結果的中位數延遲與匯入階段耗時"""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"base: {base['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    for scale, entry in new['scales'].items():
+        old_entry = base['scales'].get(scale)
+        if not old_entry:
+            continue
+        print(f'== scale {scale}x')
+        pairs = [(name, old_entry['endpoints'].get(name, {}).get('median_ms'), value['median_ms'])
+                 for name, value in entry['endpoints'].items()]
+        if 'importer' in entry and 'importer' in old_entry:
+            for stage, seconds in entry['importer']['stages_seconds'].items():
+                old_seconds = old_entry['importer']['stages_seconds'].get(stage)
+                pairs.append((f'import:{stage}', old_seconds and old_seconds * 1000, seconds * 1000))
+        for name, old_ms, new_ms in pairs:
+            if not old_ms:
+                print(f'  {name:<64} {"-":>10} {new_ms:>10.2f}')
+                continue
+            change = (new_ms - old_ms) / old_ms * 100
+            print(f'  {name:<64} {old_ms:>10.2f} {new_ms:>10.2f} {change:>+8.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='dmv_routes 效能基準測試')
+    parser.add_argument('--dsn', default=os.getenv('BENCH_DSN', 'sqlite:///bench.db'),
+                        help='測試用資料庫（會重建 dmv_routes_2025，勿指向正式資料庫）')
+    parser.add_argument('--scales', default='10,100,1000')
+    parser.add_argument('--import-scales', default='10,100',
+                        help='需產生 xlsx 並量測匯入階段的規模（1000× 的 xlsx 寫入較久）')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workdir', default='bench_data')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
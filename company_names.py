@@ -0,0 +1,20 @@
+"""公司名稱比對鍵
+
+匯入程式以比對鍵合併同一家公司的不同寫法（寫入 `dmv_companies.name_key`），
+API 依業者名稱查詢時以同一個函式正規化，兩邊的比對規則一致。
+"""
+import re
+import unicodedata
+
+COMPANY_SUFFIXES = ("股份有限公司", "有限公司")
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def company_key(name):
+    """公司名稱比對鍵：全形轉半形、去除所有空白、「台」視同「臺」、去除公司型態字尾"""
+    key = WHITESPACE.sub("", unicodedata.normalize("NFKC", str(name))).replace("台", "臺")
+    for suffix in COMPANY_SUFFIXES:
+        if key.endswith(suffix) and len(key) > len(suffix):
+            return key[:-len(suffix)]
+    return key
@@ -0,0 +1,73 @@
+"""API 回應壓縮（brotli / gzip）
+
+依 `Accept-Encoding` 選擇 brotli（需安裝 Brotli 套件）或 gzip，
+只壓縮 JSON / HTML / CSS / JS 等文字回應；Excel 檔案本身已是 zip 格式，
+以及透過 send_file 串流的靜態檔案都不處理。
+
+環境變數：
+- `COMPRESS`：設為 `0` 可停用（預設 1）
+- `COMPRESS_MIN_SIZE`：小於此位元組數不壓縮（預設 1024）
+- `COMPRESS_LEVEL`：gzip 壓縮等級（預設 6）；brotli 使用 `BROTLI_QUALITY`（預設 5）
+"""
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 依安裝環境而定
+    brotli = None
+
+COMPRESS_ENABLED = os.getenv('COMPRESS', '1') == '1'
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'application/javascript',
+    'text/javascript',
+}
+
+
+def choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    if encoding == 'br':
+        data = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    if COMPRESS_ENABLED:
+        app.after_request(compress_response)
@@ -0,0 +1,76 @@
+"""資料世代（import generation）
+
+匯入程式每次執行都會重建 `dmv_routes_2025`，並在每一列寫入同一個 `imported_at`。
+因此 `MAX(imported_at)` 加上總筆數即可代表目前資料的版本；版本不變時，
+所有 API 的結果也不會變，可用來產生 HTTP 驗證碼或判斷記憶體快取是否需重建。
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+GENERATION_SQL = "SELECT MAX(imported_at), COUNT(*) FROM dmv_routes_2025"
+
+
+class DataGeneration:
+    """取得目前資料世代，結果快取 ttl 秒以免每個請求都查詢資料庫"""
+
+    def __init__(self, engine, ttl=None):
+        self.engine = engine
+        self.ttl = float(os.getenv('DATA_GENERATION_TTL', '5')) if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._fetched_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        """回傳代表目前資料版本的字串，例如 '2025-09-19 09:55:00+0800|1234'"""
+        now = time.monotonic()
+        with self._lock:
+            if self._value is not None and now - self._fetched_at < self.ttl:
+                self.hits += 1
+                return self._value
+        with self.engine.connect() as conn:
+            imported_at, row_count = conn.execute(text(GENERATION_SQL)).fetchone()
+        value = f"{imported_at}|{row_count}"
+        with self._lock:
+            self._value = value
+            self._fetched_at = time.monotonic()
+            self.misses += 1
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+
+class ReadGeneration:
+    """唯讀副本的資料世代：以本請求使用的 engine（`db.get_read_engine`）查詢，各 engine 各自快取
+
+    副本複寫落後時，其世代與主庫不同；ETag 與 single-flight 的鍵改用副本本身的世代，
+    舊資料不會以新世代的 ETag 被快取，304 只發給與該副本資料相同的驗證碼。
+    """
+
+    def __init__(self, get_engine, ttl=None):
+        self.get_engine = get_engine
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._generations = {}
+
+    def _for(self, engine):
+        with self._lock:
+            generation = self._generations.get(engine)
+            if generation is None:
+                generation = self._generations[engine] = DataGeneration(engine, self.ttl)
+            return generation
+
+    def get(self):
+        return self._for(self.get_engine()).get()
+
+    def invalidate(self):
+        with self._lock:
+            generations = list(self._generations.values())
+        for generation in generations:
+            generation.invalidate()
@@ -0,0 +1,123 @@
+"""健康檢查端點
+
+- `GET /healthz`：存活檢查，只表示行程可回應請求，不碰資料庫
+- `GET /readyz`：就緒檢查，回報資料庫可否連線（背景探測的最近結果）、連線池使用量、
+  `dmv_routes_2025` 筆數與資料世代、各層快取命中率、各類端點的併發使用量與唯讀副本狀態；
+  主庫或資料表不可用時回 503
+
+`/readyz` 不會為每次請求連線資料庫：連線狀態取自 `db.DatabaseProbe`，
+筆數與資料世代取自 `DataGeneration` 的快取（每 `DATA_GENERATION_TTL` 秒最多查一次），
+負載平衡器每秒輪詢也不會增加資料庫負擔。
+"""
+import os
+import time
+
+from flask import jsonify
+
+import db
+import http_cache
+
+STARTED_AT = time.time()
+
+
+def _ratio(hits, total):
+    return round(hits / total, 4) if total else None
+
+
+def pool_status():
+    """連線池使用量；engine 尚未建立時回傳 None"""
+    if not db.engine_created():
+        return None
+    return _pool_info(db.get_engine().pool)
+
+
+def _pool_info(pool):
+    status = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+
+def replica_status():
+    """各唯讀副本的探測結果、輪詢次數與連線池使用量"""
+    replicas = db.replicas.status()
+    for replica, engine in zip(replicas, db.replicas.engines):
+        replica['pool'] = _pool_info(engine.pool) if engine is not None else None
+    return replicas
+
+
+def data_status(generation):
+    """由資料世代字串（'imported_at|筆數'）取出匯入時間與筆數"""
+    try:
+        token = generation.get()
+    except Exception as e:
+        return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+    imported_at, _, row_count = token.rpartition('|')
+    return {
+        'ok': True,
+        'generation': token,
+        'imported_at': imported_at if imported_at != 'None' else None,
+        'row_count': int(row_count),
+    }
+
+
+def cache_status(generation, snapshot=None, suggester=None, flights=None):
+    http = dict(http_cache.snapshot_stats(), enabled=http_cache.HTTP_CACHE_ENABLED)
+    http['hit_rate'] = _ratio(http['not_modified'], http['requests'])
+    status = {
+        'http': http,
+        'generation': {
+            'hits': generation.hits,
+            'misses': generation.misses,
+            'hit_rate': _ratio(generation.hits, generation.hits + generation.misses),
+        },
+    }
+    if snapshot is not None:
+        status['snapshot'] = snapshot.status()
+    if suggester is not None:
+        status['suggest'] = suggester.status()
+    if flights is not None:
+        status['singleflight'] = flights.status()
+    return status
+
+
+def init_app(app, probe, generation, snapshot=None, suggester=None, flights=None, limiter=None):
+    """註冊 /healthz 與 /readyz"""
+
+    @app.route('/healthz')
+    def healthz():
+        return jsonify({
+            'status': 'ok',
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - STARTED_AT, 1),
+        })
+
+    @app.route('/readyz')
+    def readyz():
+        # fork 出的 worker 或 SKIP_DB=1 時尚未啟動探測，於此補啟動
+        probe.start()
+        result = dict(probe.result)
+        if result['checked_at'] is not None:
+            result['age_seconds'] = round(time.time() - result['checked_at'], 1)
+
+        data = data_status(generation) if result['ok'] else {'ok': False, 'error': '資料庫無法連線'}
+        ready = bool(result['ok']) and data['ok']
+        if result['ok'] is None:
+            status = 'starting'
+        else:
+            status = 'ready' if ready else 'unavailable'
+
+        payload = {
+            'status': status,
+            'database': result,
+            'pool': pool_status(),
+            'data': data,
+            'cache': cache_status(generation, snapshot, suggester, flights),
+        }
+        if db.replicas:
+            payload['replicas'] = replica_status()
+        if limiter is not None:
+            payload['admission'] = limiter.status()
+        return jsonify(payload), 200 if ready else 503
@@ -0,0 +1,72 @@
+"""API 回應的 HTTP 快取（ETag / Cache-Control / 304）
+
+ETag 由資料世代（見 `data_generation.py`）、路徑與查詢參數雜湊而成。
+瀏覽器或反向代理帶著 `If-None-Match` 回來時，只要資料世代未變，
+直接回傳 304，不執行該端點的查詢。
+
+環境變數：
+- `HTTP_CACHE`：設為 `0` 可停用（預設 1）
+- `API_CACHE_CONTROL`：回應的 Cache-Control（預設 `no-cache`，即每次都向伺服器驗證）
+"""
+import functools
+import hashlib
+import os
+import threading
+
+from flask import make_response, request
+
+HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE', '1') == '1'
+API_CACHE_CONTROL = os.getenv('API_CACHE_CONTROL', 'no-cache')
+
+# 供健康檢查回報命中率；多執行緒 worker 下以鎖保護累加
+stats = {'requests': 0, 'not_modified': 0}
+_stats_lock = threading.Lock()
+
+
+def snapshot_stats():
+    """回傳 stats 的一致副本"""
+    with _stats_lock:
+        return dict(stats)
+
+
+def make_etag(generation):
+    """以資料世代 + 路徑 + 排序後的查詢參數產生 ETag"""
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    raw = f'{generation}|{request.path}|{args}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def conditional(generation):
+    """端點裝飾器：處理 If-None-Match 並為成功回應加上 ETag 與 Cache-Control
+
+    ETag 使用弱驗證碼（W/），壓縮與未壓縮的回應可共用同一個驗證碼。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not HTTP_CACHE_ENABLED:
+                return view(*args, **kwargs)
+
+            try:
+                etag = make_etag(generation.get())
+            except Exception:
+                # 取不到資料世代（例如資料庫離線）時不做快取，交由端點本身回報錯誤
+                return view(*args, **kwargs)
+
+            not_modified = request.if_none_match.contains_weak(etag)
+            with _stats_lock:
+                stats['requests'] += 1
+                if not_modified:
+                    stats['not_modified'] += 1
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = API_CACHE_CONTROL
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,224 @@
+"""負載測試：重播儀表板流量
+
+每個虛擬使用者重複以下流程，直到測試時間結束：
+1. 開啟儀表板：載入 `/`，接著與 `static/script.js` 相同，同時發出三個請求
+   （`/api/routes`、`/api/detailed-statistics`、`/api/sample-table`）
+2. 進行數次搜尋（`/api/routes/search`，隨機監理所、路線類型、關鍵字與頁碼）
+3. 依比例下載 Excel（兩個匯出擇一）
+
+每次操作之間有隨機的思考時間。結束後依端點列出 p50/p95/p99 延遲、吞吐量與錯誤率，
+可用 `--output` 另存 JSON，用來驗證連線池大小、快取等調整。只使用標準函式庫。
+
+用法：
+    python loadtest.py --base-url http://127.0.0.1:5050 --users 50 --duration 60
+"""
+import argparse
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+DISPLAY_FIELDS = 'district,route_type,公司名稱,路線編號,路線名稱,里程往,里程返,班次一,車輛數,站牌數往'
+DISTRICTS = ['', 'taipei', 'hsinchu', 'taichung', 'chiayi', 'kaohsiung']
+ROUTE_TYPES = ['', 'local_routes', 'hwy_routes']
+SEARCH_TERMS = ['', '', '客運', '國光', '統聯', '臺北', '台中', '嘉義', '高雄', '機場', '1', '9']
+EXPORTS = ['/export/detailed-statistics.xlsx', '/export/sample-table.xlsx']
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Recorder:
+    """以端點路徑彙整每次請求的延遲與結果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.not_modified = {}
+
+    def record(self, label, seconds, ok, status):
+        with self._lock:
+            self.samples.setdefault(label, []).append(seconds)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+            if status == 304:
+                self.not_modified[label] = self.not_modified.get(label, 0) + 1
+
+    def report(self, elapsed):
+        rows = {}
+        with self._lock:
+            labels = sorted(self.samples)
+            everything = []
+            for label in labels:
+                ordered = sorted(self.samples[label])
+                everything.extend(ordered)
+                rows[label] = self._summary(ordered, self.errors.get(label, 0),
+                                            self.not_modified.get(label, 0), elapsed)
+            everything.sort()
+            rows['TOTAL'] = self._summary(everything, sum(self.errors.values()),
+                                          sum(self.not_modified.values()), elapsed)
+        return rows
+
+    @staticmethod
+    def _summary(ordered, errors, not_modified, elapsed):
+        count = len(ordered)
+        return {
+            'requests': count,
+            'errors': errors,
+            'error_rate': round(errors / count, 4) if count else 0.0,
+            'not_modified': not_modified,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 2) if count else None,
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 2) if count else None,
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 2) if count else None,
+            'mean_ms': round(statistics.fmean(ordered) * 1000, 2) if count else None,
+        }
+
+
+class Client:
+    """每條執行緒各自保持一條 keep-alive 連線（與瀏覽器行為相近）"""
+
+    def __init__(self, base_url, timeout, recorder, revalidate):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.timeout = timeout
+        self.recorder = recorder
+        self.revalidate = revalidate
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.netloc, timeout=self.timeout)
+        return conn
+
+    def _etags(self):
+        if not hasattr(self._local, 'etags'):
+            self._local.etags = {}
+        return self._local.etags
+
+    def get(self, path):
+        label = path.split('?', 1)[0]
+        headers = {'Accept-Encoding': 'gzip, br'}
+        etags = self._etags()
+        if self.revalidate and path in etags:
+            headers['If-None-Match'] = etags[path]
+
+        start = time.perf_counter()
+        status = None
+        try:
+            conn = self._connection()
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader('ETag'):
+                etags[path] = response.getheader('ETag')
+            ok = 200 <= status < 400
+        except Exception:
+            ok = False
+            conn = getattr(self._local, 'conn', None)
+            if conn is not None:
+                conn.close()
+            self._local.conn = None
+        self.recorder.record(label, time.perf_counter() - start, ok, status)
+
+
+def virtual_user(client, args, deadline, rng):
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        while time.monotonic() < deadline:
+            # 1. 開啟儀表板：頁面 + 三個並行 API 請求
+            client.get('/')
+            routes_query = urlencode({'format': 'columnar', 'fields': DISPLAY_FIELDS})
+            futures = [pool.submit(client.get, path) for path in (
+                f'/api/routes?{routes_query}', '/api/detailed-statistics', '/api/sample-table')]
+            for future in futures:
+                future.result()
+
+            # 2. 搜尋
+            for _ in range(args.searches):
+                if time.monotonic() >= deadline:
+                    return
+                time.sleep(rng.uniform(0, 2 * args.think_time))
+                params = {k: v for k, v in {
+                    'district': rng.choice(DISTRICTS),
+                    'route_type': rng.choice(ROUTE_TYPES),
+                    'search': rng.choice(SEARCH_TERMS),
+                    'page': rng.choice([1, 1, 1, 2, 3]),
+                }.items() if v != ''}
+                client.get(f'/api/routes/search?{urlencode(params)}')
+
+            # 3. Excel 下載
+            if rng.random() < args.export_ratio:
+                time.sleep(rng.uniform(0, 2 * args.think_time))
+                client.get(rng.choice(EXPORTS))
+
+            time.sleep(rng.uniform(0, 2 * args.think_time))
+
+
+def print_report(report):
+    header = f"{'endpoint':<36}{'reqs':>8}{'err%':>8}{'304':>7}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}"
+    print(header)
+    print('-' * len(header))
+    for label, row in report.items():
+        print(f"{label:<36}{row['requests']:>8}{row['error_rate'] * 100:>7.2f}%{row['not_modified']:>7}"
+              f"{row['throughput_rps']:>9}{row['p50_ms']!s:>10}{row['p95_ms']!s:>10}{row['p99_ms']!s:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重播儀表板流量的負載測試')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5050')
+    parser.add_argument('--users', type=int, default=20, help='同時在線的虛擬使用者數')
+    parser.add_argument('--duration', type=float, default=60, help='測試秒數')
+    parser.add_argument('--ramp-up', type=float, default=5, help='所有使用者啟動完成所需秒數')
+    parser.add_argument('--think-time', type=float, default=1.0, help='操作間平均思考秒數')
+    parser.add_argument('--searches', type=int, default=3, help='每次開啟儀表板後的搜尋次數')
+    parser.add_argument('--export-ratio', type=float, default=0.1, help='每輪下載 Excel 的機率')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--revalidate', action='store_true',
+                        help='像瀏覽器一樣以 If-None-Match 重新驗證已取得的回應')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', help='另存 JSON 結果')
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    client = Client(args.base_url, args.timeout, recorder, args.revalidate)
+    seed_rng = random.Random(args.seed)
+    started = time.monotonic()
+    deadline = started + args.duration
+
+    threads = []
+    for i in range(args.users):
+        rng = random.Random(seed_rng.random())
+        thread = threading.Thread(target=virtual_user, args=(client, args, deadline, rng), daemon=True)
+        threads.append(thread)
+        thread.start()
+        if args.ramp_up and args.users > 1:
+            time.sleep(args.ramp_up / args.users)
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.monotonic() - started
+    report = recorder.report(elapsed)
+    print(f'{args.users} users, {elapsed:.1f} s, {args.base_url}')
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'elapsed_seconds': round(elapsed, 2), 'endpoints': report},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
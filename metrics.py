@@ -0,0 +1,249 @@
+"""請求與資料庫效能指標（Prometheus 文字格式，`GET /metrics`）
+
+收集項目：
+- 每個端點的請求延遲、回應大小（實際送出的位元組，含壓縮）、錯誤類型
+- 各階段耗時：db（SQLAlchemy 事件掛勾累計）、serialize（jsonify）、excel（openpyxl 輸出）、
+  snapshot（記憶體快照查詢），其餘歸為 python（組裝 dict 等）
+- 每次查詢的耗時與每個請求取回的資料列數（資料列數取自 cursor.rowcount，SQLite 不提供）
+
+`/metrics` 須帶 `Authorization: Bearer <METRICS_TOKEN>`；未設定 `METRICS_TOKEN` 時一律回 403，
+除非以 `METRICS_PUBLIC=1` 明確開放（不以連線來源判斷，反向代理後所有請求都來自本機）。
+"""
+import hmac
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', '0') == '1'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, key)} {value}')
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f'# TYPE {self.name} gauge'
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label_values -> [bucket_counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    labels = _format_labels(self.labels, key, f'le="{bound}"')
+                    lines.append(f'{self.name}_bucket{labels} {bucket_count}')
+                labels = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f'{self.name}_bucket{labels} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {total}')
+                lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {count}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', '每個端點的請求處理時間',
+    labels=('endpoint', 'method', 'status'))
+REQUEST_PHASE = Histogram(
+    'http_request_phase_seconds', '請求各階段耗時（db / serialize / excel / snapshot / suggest / python）',
+    labels=('endpoint', 'phase'))
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', '回應大小（送出的位元組，含壓縮）',
+    labels=('endpoint',), buckets=SIZE_BUCKETS)
+REQUEST_ERRORS = Counter(
+    'http_request_errors_total', '端點捕捉到的例外（依例外類型）',
+    labels=('endpoint', 'exception'))
+IN_FLIGHT = Gauge('http_requests_in_flight', '處理中的請求數')
+ADMISSION_REJECTED = Counter(
+    'http_requests_rejected_total', '因併發上限而拒絕的請求（429：該類端點額滿，503：全體額滿）',
+    labels=('endpoint', 'group', 'status'))
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', '單一 SQL 敘述的執行時間',
+    labels=('endpoint',))
+DB_ROWS = Histogram(
+    'db_rows_returned', '每個請求由資料庫取回的資料列數',
+    labels=('endpoint',), buckets=ROW_BUCKETS)
+
+REGISTRY = [REQUEST_DURATION, REQUEST_PHASE, RESPONSE_SIZE, REQUEST_ERRORS, IN_FLIGHT,
+            ADMISSION_REJECTED, DB_QUERY_DURATION, DB_ROWS]
+
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'background'
+
+
+def _phases():
+    if not hasattr(g, 'metrics_phases'):
+        g.metrics_phases = {}
+    return g.metrics_phases
+
+
+@contextmanager
+def phase(name):
+    """記錄請求中某段處理的耗時，例如 `with metrics.phase('excel'):`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context():
+            phases = _phases()
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def record_error(exc):
+    REQUEST_ERRORS.inc(current_endpoint(), type(exc).__name__)
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# ---- SQLAlchemy 事件掛勾 ----
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    DB_QUERY_DURATION.observe(elapsed, current_endpoint())
+    if has_request_context():
+        phases = _phases()
+        phases['db'] = phases.get('db', 0.0) + elapsed
+        if cursor.rowcount is not None and cursor.rowcount >= 0 and cursor.description is not None:
+            g.metrics_rows = getattr(g, 'metrics_rows', 0) + cursor.rowcount
+
+
+def instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+# ---- Flask 掛勾 ----
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    IN_FLIGHT.dec()
+    endpoint = current_endpoint()
+    total = time.perf_counter() - start
+
+    REQUEST_DURATION.observe(total, endpoint, request.method, str(response.status_code))
+    phases = _phases()
+    for name, seconds in phases.items():
+        REQUEST_PHASE.observe(seconds, endpoint, name)
+    REQUEST_PHASE.observe(max(total - sum(phases.values()), 0.0), endpoint, 'python')
+
+    size = response.content_length
+    if size is None and not response.direct_passthrough:
+        size = len(response.get_data())
+    if size is not None:
+        RESPONSE_SIZE.observe(size, endpoint)
+    if hasattr(g, 'metrics_rows'):
+        DB_ROWS.observe(g.metrics_rows, endpoint)
+    return response
+
+
+def _authorized():
+    if METRICS_TOKEN:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+    return METRICS_PUBLIC
+
+
+def metrics_endpoint():
+    if not _authorized():
+        return Response('forbidden\n', status=403, mimetype='text/plain')
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app, engine=None):
+    """註冊請求掛勾、/metrics 端點，並為 engine（若有）加上查詢計時
+
+    需在 json_codec.init_app 之後（才能包住實際使用的 JSON provider）、
+    compression.init_app 之前呼叫（after_request 反序執行，才能量到壓縮後大小）。
+    engine 延遲建立時改以 `db.on_create(metrics.instrument_engine)` 掛上。
+    """
+    if engine is not None:
+        instrument_engine(engine)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
+
+    json_response = app.json.response
+
+    def timed_json_response(*args, **kwargs):
+        with phase('serialize'):
+            return json_response(*args, **kwargs)
+    app.json.response = timed_json_response
@@ -0,0 +1,573 @@
+"""共用 SQL 與查詢結果整理邏輯
+
+同步版 `app.py` 與非同步版 `async_app.py` 皆由此取得 SQL 與組裝回應的函式，
+確保兩個 API 層回傳的 JSON 結構完全一致。
+
+環境變數：
+- `API_MAX_LIMIT`：`limit` 參數上限（預設 5000）
+- `API_MAX_PER_PAGE`：`per_page` 參數上限（預設 200）
+"""
+import os
+
+API_MAX_LIMIT = int(os.getenv('API_MAX_LIMIT', '5000'))
+API_MAX_PER_PAGE = int(os.getenv('API_MAX_PER_PAGE', '200'))
+
+# 監理所代碼 (根據source_file區分台北區和台北市區)
+DISTRICT_KEY_SQL = """
+    CASE
+        WHEN source_file LIKE '%臺北區監理所%' THEN 'taipei_district'
+        WHEN source_file LIKE '%臺北市區監理所%' THEN 'taipei_city'
+        ELSE district
+    END
+"""
+
+
+def district_name_sql(fallback='district'):
+    """監理所中文名稱 CASE 運算式，fallback 為無法對應時的值"""
+    return f"""
+    CASE
+        WHEN source_file LIKE '%臺北區監理所%' THEN '臺北區監理所'
+        WHEN source_file LIKE '%臺北市區監理所%' THEN '臺北市區監理所'
+        WHEN district = 'hsinchu' THEN '新竹區監理所'
+        WHEN district = 'taichung' THEN '台中區監理所'
+        WHEN district = 'chiayi' THEN '嘉義區監理所'
+        WHEN district = 'kaohsiung' THEN '高雄區監理所'
+        ELSE {fallback}
+    END
+"""
+
+
+class InvalidParameter(ValueError):
+    """查詢參數不合法（端點回應 400）"""
+
+
+# ---- 欄位投影 (fields=) ----
+
+# 可查詢的路線欄位白名單（亦為 /api/routes 的預設欄位與順序）
+ROUTE_FIELDS = [
+    'district', 'route_type', '公司名稱', '路線編號', '路線名稱',
+    '里程往', '里程返', '班次一', '班次二', '班次三', '班次四', '班次五', '班次六', '班次日',
+    '車輛數', '站牌數往', '站牌數返', '補貼_路線', '聯營業者', '路線性質',
+    'source_file', 'imported_at',
+]
+
+# /api/routes/search 的預設欄位
+SEARCH_DEFAULT_FIELDS = [
+    'district', 'route_type', '公司名稱', '路線編號', '路線名稱',
+    '里程往', '里程返', '班次一', '車輛數', '站牌數往',
+]
+
+# DECIMAL 欄位，於 SQL 中轉為浮點數，驅動程式直接回傳 float
+FLOAT_FIELDS = {'里程往', '里程返'}
+
+# 時間型別欄位，於 SQL 中轉為字串，API 回應維持字串格式
+TEXT_FIELDS = {'imported_at'}
+
+# 列式格式中以字典索引編碼的低基數文字欄位
+DICTIONARY_FIELDS = {'district', 'route_type', '公司名稱', '補貼_路線', '路線性質',
+                     'source_file', 'imported_at'}
+
+
+def _column_sql(name):
+    column = name if name.isascii() else f'"{name}"'
+    if name in FLOAT_FIELDS:
+        return f'CAST({column} AS FLOAT)'
+    if name in TEXT_FIELDS:
+        return f'CAST({column} AS VARCHAR)'
+    return column
+
+
+# 欄位 -> SQL 運算式；/api/routes 的 district 依 source_file 區分台北區和台北市區
+ROUTES_FIELD_SQL = {name: _column_sql(name) for name in ROUTE_FIELDS}
+ROUTES_FIELD_SQL['district'] = DISTRICT_KEY_SQL
+SEARCH_FIELD_SQL = {name: _column_sql(name) for name in ROUTE_FIELDS}
+
+
+def parse_fields(args, default):
+    """解析 fields=a,b,c；未指定時使用 default，含白名單以外欄位時拋出 InvalidParameter"""
+    raw = args.get('fields', '')
+    if not raw.strip():
+        return list(default)
+    fields = []
+    for name in raw.split(','):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in SEARCH_FIELD_SQL:
+            raise InvalidParameter(f'不支援的欄位：{name}')
+        fields.append(name)
+    return fields or list(default)
+
+
+def select_list(fields, field_sql):
+    return ',\n        '.join(f'{field_sql[name]} AS "{name}"' for name in fields)
+
+
+# ---- 回應格式 ----
+
+def parse_format(args):
+    """format=columnar 時改以列式格式回傳路線資料，其餘值皆為預設的逐筆物件格式"""
+    return 'columnar' if args.get('format') == 'columnar' else 'rows'
+
+
+def to_columnar(columns, rows, dictionary_columns=()):
+    """列式編碼：欄名只送一次，每筆資料為值的陣列
+
+    dictionary_columns 中的欄位（例如 source_file、imported_at 這類在每筆重複的字串）
+    改存為 dictionaries[欄名] 的索引，前端再還原。
+    """
+    positions = [i for i, c in enumerate(columns) if c in dictionary_columns]
+    lookups = [(i, {}) for i in positions]
+    encoded = []
+    for row in rows:
+        values = list(row)
+        for i, lookup in lookups:
+            value = values[i]
+            index = lookup.get(value)
+            if index is None:
+                index = lookup[value] = len(lookup)
+            values[i] = index
+        encoded.append(values)
+    return {
+        'columns': columns,
+        'rows': encoded,
+        'dictionaries': {columns[i]: list(lookup) for i, lookup in lookups},
+    }
+
+
+def encode_routes(fields, rows, fmt='rows'):
+    """依投影欄位序列化路線資料列（逐筆物件或列式格式）
+
+    數值欄位已在 SQL 中轉型，資料列不需逐值轉換：逐筆格式以預先決定的欄名 tuple
+    直接 zip 成 dict，列式格式只處理字典編碼欄位。rows 可直接傳入查詢結果逐筆讀取，
+    不必先 fetchall()，資料列讀完即可回收，GC 負擔較小。
+    """
+    if fmt == 'columnar':
+        return to_columnar(fields, rows, DICTIONARY_FIELDS)
+    keys = tuple(fields)
+    return [dict(zip(keys, row)) for row in rows]
+
+
+# ---- /api/routes ----
+
+def routes_sql(fields):
+    return f"""
+    SELECT
+        {select_list(fields, ROUTES_FIELD_SQL)}
+    FROM dmv_routes_2025
+    LIMIT :limit
+"""
+
+
+ROUTE_STATS_SQL = """
+    SELECT
+        COUNT(*) as total,
+        COUNT(DISTINCT district) as districts,
+        SUM(CASE WHEN route_type = 'local_routes' THEN 1 ELSE 0 END) as local_routes,
+        SUM(CASE WHEN route_type = 'hwy_routes' THEN 1 ELSE 0 END) as hwy_routes
+    FROM dmv_routes_2025
+"""
+
+
+def parse_limit(args, default=300, maximum=None):
+    """解析 limit 參數，非法或非正數時使用預設值，超過上限（預設 API_MAX_LIMIT）時以上限計"""
+    try:
+        limit = int(args.get('limit', str(default)))
+        if limit <= 0:
+            limit = default
+    except Exception:
+        limit = default
+    return min(limit, API_MAX_LIMIT if maximum is None else maximum)
+
+
+def build_route_statistics(stats_row):
+    return {
+        'total': stats_row[0],
+        'districts': stats_row[1],
+        'local_routes': stats_row[2],
+        'hwy_routes': stats_row[3]
+    }
+
+
+# ---- /api/routes/search ----
+
+def parse_search_args(args):
+    """取得查詢參數 (district, route_type, search, page, per_page)
+
+    page 須 >= 1、per_page 須介於 1 與 API_MAX_PER_PAGE 之間，否則拋出 InvalidParameter。
+    """
+    try:
+        page = int(args.get('page', 1))
+        per_page = int(args.get('per_page', 20))
+    except (TypeError, ValueError):
+        raise InvalidParameter('page、per_page 須為整數') from None
+    if page < 1:
+        raise InvalidParameter('page 須為正整數')
+    if not 1 <= per_page <= API_MAX_PER_PAGE:
+        raise InvalidParameter(f'per_page 須介於 1 與 {API_MAX_PER_PAGE} 之間')
+    return {
+        'district': args.get('district', ''),
+        'route_type': args.get('route_type', ''),
+        'search_term': args.get('search', ''),
+        'page': page,
+        'per_page': per_page,
+    }
+
+
+def like_operator(dialect_name):
+    """PostgreSQL 使用 ILIKE；SQLite 替身沒有 ILIKE，其 LIKE 對 ASCII 本就不分大小寫"""
+    return 'ILIKE' if dialect_name == 'postgresql' else 'LIKE'
+
+
+def build_search_where(district, route_type, search_term, like='ILIKE', prefix=''):
+    """建構查詢條件，回傳 (where_clause, params)；prefix 加在參數名稱前（批次查詢合併時避免衝突）"""
+    conditions = []
+    params = {}
+
+    if district:
+        conditions.append(f'district = :{prefix}district')
+        params[prefix + 'district'] = district
+
+    if route_type:
+        conditions.append(f'route_type = :{prefix}route_type')
+        params[prefix + 'route_type'] = route_type
+
+    if search_term:
+        conditions.append(f'''(
+            "路線名稱" {like} :{prefix}search_term OR
+            "路線編號" {like} :{prefix}search_term OR
+            "公司名稱" {like} :{prefix}search_term
+        )''')
+        params[prefix + 'search_term'] = f'%{search_term}%'
+
+    where_clause = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+    return where_clause, params
+
+
+def search_count_sql(where_clause):
+    return f"SELECT COUNT(*) FROM dmv_routes_2025 {where_clause}"
+
+
+def search_data_sql(where_clause, fields=SEARCH_DEFAULT_FIELDS):
+    return f"""
+        SELECT
+            {select_list(fields, SEARCH_FIELD_SQL)}
+        FROM dmv_routes_2025
+        {where_clause}
+        ORDER BY district, route_type, "路線編號"
+        LIMIT :per_page OFFSET :offset
+    """
+
+
+# 分面統計欄位（facets=1），依目前搜尋條件計算各值的筆數
+FACET_FIELDS = ['district', 'route_type', '路線性質']
+
+
+def parse_facets(args):
+    return args.get('facets', '').strip().lower() in ('1', 'true', 'yes')
+
+
+def search_facets_sql(where_clause, dialect_name):
+    """總筆數與各分面筆數，一次掃描取代 search_count_sql
+
+    回傳 (facet, value, count)；facet 為 'total' 的列即總筆數。PostgreSQL 使用
+    GROUPING SETS（以 GROUPING() 區分分組，路線性質本身的 NULL 不會被誤判），
+    其他資料庫（SQLite 替身）以 UNION ALL 合併各 GROUP BY。
+    """
+    columns = [_column_sql(name) for name in FACET_FIELDS]
+    if dialect_name == 'postgresql':
+        cases = '\n'.join(f"                WHEN GROUPING({col}) = 0 THEN '{name}'"
+                          for name, col in zip(FACET_FIELDS, columns))
+        sets = ', '.join(f'({col})' for col in columns)
+        return f"""
+        SELECT
+            CASE
+{cases}
+            ELSE 'total'
+            END AS facet,
+            COALESCE({', '.join(columns)}) AS value,
+            COUNT(*) AS count
+        FROM dmv_routes_2025
+        {where_clause}
+        GROUP BY GROUPING SETS ((), {sets})
+    """
+    parts = [f"SELECT 'total' AS facet, NULL AS value, COUNT(*) AS count FROM dmv_routes_2025 {where_clause}"]
+    for name, col in zip(FACET_FIELDS, columns):
+        parts.append(f"SELECT '{name}', {col}, COUNT(*) FROM dmv_routes_2025 {where_clause} GROUP BY {col}")
+    return '\n        UNION ALL\n        '.join(parts)
+
+
+def sort_facet_counts(counts):
+    """依筆數由多到少、同筆數依值排序（NULL 最後），回傳 [{value, count}]"""
+    ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0] is None, item[0] or ''))
+    return [{'value': value, 'count': count} for value, count in ordered]
+
+
+def build_facets(rows):
+    """整理 search_facets_sql 的結果，回傳 (總筆數, {分面: [{value, count}]})"""
+    total = 0
+    counts = {name: {} for name in FACET_FIELDS}
+    for facet, value, count in rows:
+        if facet == 'total':
+            total = int(count)
+        elif int(count):
+            counts[facet][value] = int(count)
+    return total, {name: sort_facet_counts(values) for name, values in counts.items()}
+
+
+def build_search_payload(routes, total_count, page, per_page):
+    return {
+        'success': True,
+        'routes': routes,
+        'total': total_count,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': (total_count + per_page - 1) // per_page
+    }
+
+
+# ---- /api/operators/<name>/routes ----
+
+# 名稱可為標準名稱或任一原始寫法（別名）
+# 以比對鍵（company_names.company_key，與匯入時相同）或任一原始寫法查公司；
+# 依 company_id 排序，對到多家公司時由呼叫端回應 409
+OPERATOR_LOOKUP_SQL = """
+    SELECT c.company_id, c."公司名稱"
+    FROM dmv_companies c
+    WHERE c.name_key = :name_key
+       OR c.company_id IN (SELECT company_id FROM dmv_company_aliases WHERE alias = :name)
+    ORDER BY c.company_id
+"""
+
+OPERATOR_ROLES = ('operator', 'joint')
+
+
+def parse_operator_role(args):
+    """role=operator（主要業者）或 joint（聯營），未指定時兩者皆列"""
+    role = args.get('role', '').strip()
+    if role and role not in OPERATOR_ROLES:
+        raise InvalidParameter(f'role 必須為 operator 或 joint：{role}')
+    return role or None
+
+
+def operator_routes_sql(fields, role=None):
+    """依業者查路線的一頁（dmv_route_operators 主鍵 company_id 開頭，走索引）
+
+    排序最後加上 r.id，路線編號重複時分頁仍穩定。
+    """
+    role_filter = 'AND o.role = :role' if role else ''
+    return f"""
+    SELECT
+        {select_list(fields, SEARCH_FIELD_SQL)},
+        o.role AS "role"
+    FROM dmv_route_operators o
+    JOIN dmv_routes_2025 r ON r.id = o.route_id
+    WHERE o.company_id = :company_id {role_filter}
+    ORDER BY r.district, r.route_type, r."路線編號", r.id
+    LIMIT :per_page OFFSET :offset
+"""
+
+
+# 各角色的路線數（不受 role 篩選影響），total 由此加總
+OPERATOR_ROLE_COUNTS_SQL = """
+    SELECT o.role, COUNT(*)
+    FROM dmv_route_operators o
+    WHERE o.company_id = :company_id
+    GROUP BY o.role
+"""
+
+
+# ---- /api/statistics ----
+
+STATISTICS_SQL = f"""
+    SELECT
+        {DISTRICT_KEY_SQL} as district_key,
+        route_type,
+        COUNT(*) as route_count,
+        COUNT(DISTINCT company_id) as company_count
+    FROM dmv_routes_2025
+    WHERE district IS NOT NULL
+    GROUP BY district_key, route_type
+    ORDER BY district_key, route_type
+"""
+
+TOTAL_COMPANIES_SQL = """
+    SELECT COUNT(DISTINCT company_id) as total_companies
+    FROM dmv_routes_2025
+    WHERE company_id IS NOT NULL
+"""
+
+
+def build_statistics(stats, total_companies):
+    """整理監理所 × 路線類型統計"""
+    statistics = {}
+    total_routes = 0
+
+    for row in stats:
+        district = row[0]
+        route_type = row[1]
+        route_count = row[2]
+        company_count = row[3]
+
+        total_routes += route_count
+
+        if district not in statistics:
+            statistics[district] = {
+                'hwy_routes': {'route_count': 0, 'company_count': 0},
+                'local_routes': {'route_count': 0, 'company_count': 0}
+            }
+
+        statistics[district][route_type] = {
+            'route_count': route_count,
+            'company_count': company_count
+        }
+
+    return {
+        'success': True,
+        'statistics': statistics,
+        'totals': {
+            'total_routes': total_routes,
+            'total_companies': total_companies
+        }
+    }
+
+
+# ---- /api/detailed-statistics ----
+
+DETAILED_STATISTICS_SQL = f"""
+    SELECT s.district_name, c."公司名稱", s.route_type, s.route_count
+    FROM (
+        SELECT
+            {district_name_sql()} as district_name,
+            company_id,
+            route_type,
+            COUNT(*) as route_count
+        FROM dmv_routes_2025
+        WHERE company_id IS NOT NULL
+        GROUP BY district_name, company_id, route_type
+    ) s
+    JOIN dmv_companies c ON c.company_id = s.company_id
+    ORDER BY s.district_name, c."公司名稱", s.route_type
+"""
+
+
+def build_detailed_statistics(rows):
+    """整理監理所 -> 公司 -> 類型層級統計，並計算各監理所小計"""
+    detailed_stats = {}
+
+    for row in rows:
+        district = row[0]
+        company = row[1]
+        route_type = row[2]
+        count = row[3]
+
+        if district not in detailed_stats:
+            detailed_stats[district] = {}
+
+        if company not in detailed_stats[district]:
+            detailed_stats[district][company] = {
+                'hwy_routes': 0,
+                'local_routes': 0,
+                'total': 0
+            }
+
+        detailed_stats[district][company][route_type] = count
+        detailed_stats[district][company]['total'] += count
+
+    # 計算每個監理所的總計
+    district_totals = {}
+    for district, companies in detailed_stats.items():
+        district_totals[district] = {
+            'hwy_routes': 0,
+            'local_routes': 0,
+            'total': 0,
+            'companies': len(companies)
+        }
+
+        for company_data in companies.values():
+            district_totals[district]['hwy_routes'] += company_data.get('hwy_routes', 0)
+            district_totals[district]['local_routes'] += company_data.get('local_routes', 0)
+            district_totals[district]['total'] += company_data.get('total', 0)
+
+    return {
+        'success': True,
+        'detailed_statistics': detailed_stats,
+        'district_totals': district_totals
+    }
+
+
+# ---- /api/sample-table ----
+
+def build_sample_table(rows, weights=(1, 2)):
+    """依監理所、公司、路線類型彙整 24/25 班次路線數與樣本數
+
+    weights 為 (24 班次以下, 25 班次以上) 每條路線計入的樣本數；切點由 rows 決定
+    （見 sampling.Histograms.rows）。
+    """
+    data = {}
+    district_totals = {}
+    grand_totals = {
+        'hwy': {'a': 0, 'b': 0, 'samples': 0},
+        'local': {'c': 0, 'd': 0, 'samples': 0},
+        'samples_total': 0
+    }
+
+    for row in rows:
+        district = row[0]
+        company = row[1]
+        route_type = row[2]  # 'hwy_routes' or 'local_routes'
+        cnt_24 = int(row[3])
+        cnt_25 = int(row[4])
+
+        if district not in data:
+            data[district] = {}
+        if company not in data[district]:
+            data[district][company] = {
+                'hwy': {'a': 0, 'b': 0, 'samples': 0},
+                'local': {'c': 0, 'd': 0, 'samples': 0}
+            }
+        if district not in district_totals:
+            district_totals[district] = {
+                'hwy': {'a': 0, 'b': 0, 'samples': 0},
+                'local': {'c': 0, 'd': 0, 'samples': 0},
+                'samples_total': 0
+            }
+
+        if route_type == 'hwy_routes':
+            samples = cnt_24 * weights[0] + cnt_25 * weights[1]
+            data[district][company]['hwy']['a'] += cnt_24
+            data[district][company]['hwy']['b'] += cnt_25
+            data[district][company]['hwy']['samples'] += samples
+
+            district_totals[district]['hwy']['a'] += cnt_24
+            district_totals[district]['hwy']['b'] += cnt_25
+            district_totals[district]['hwy']['samples'] += samples
+
+            grand_totals['hwy']['a'] += cnt_24
+            grand_totals['hwy']['b'] += cnt_25
+            grand_totals['hwy']['samples'] += samples
+        elif route_type == 'local_routes':
+            samples = cnt_24 * weights[0] + cnt_25 * weights[1]
+            data[district][company]['local']['c'] += cnt_24
+            data[district][company]['local']['d'] += cnt_25
+            data[district][company]['local']['samples'] += samples
+
+            district_totals[district]['local']['c'] += cnt_24
+            district_totals[district]['local']['d'] += cnt_25
+            district_totals[district]['local']['samples'] += samples
+
+            grand_totals['local']['c'] += cnt_24
+            grand_totals['local']['d'] += cnt_25
+            grand_totals['local']['samples'] += samples
+
+    # 計算各區總樣本
+    for d, tot in district_totals.items():
+        tot['samples_total'] = tot['hwy']['samples'] + tot['local']['samples']
+    grand_totals['samples_total'] = grand_totals['hwy']['samples'] + grand_totals['local']['samples']
+
+    return {
+        'success': True,
+        'by_district': data,
+        'district_totals': district_totals,
+        'grand_totals': grand_totals
+    }
@@ -0,0 +1,255 @@
+"""路線資料記憶體快照（可選，`ROUTE_SNAPSHOT=1`）
+
+`dmv_routes_2025` 只有數百到數十萬筆，整張表放進記憶體綽綽有餘。啟用後，
+`app.py` 的搜尋、篩選、筆數與統計端點改由行程內的列式快照回應，不再每次向資料庫
+做 ILIKE 掃描與 COUNT：
+- 監理所（原始 district）與路線類型各自預先建好布林遮罩（bitmap），篩選只需 AND
+- 路線名稱 / 路線編號 / 公司名稱轉小寫後串成一個字串，關鍵字以 `str.find` 在 C 層比對，
+  再以各列起始位置換算列號
+- 搜尋排序（district, route_type, 路線編號）預先算好，分頁只需切片
+- /api/statistics、/api/detailed-statistics 的結果與抽樣用的班次一直方圖於載入時一次算好
+
+快照在啟動時於背景載入，之後每次使用前比對資料世代（見 `data_generation.py`），
+匯入新資料後自動重建。重建期間其他請求會等待新快照，不會拿到舊資料配新的 ETag。
+
+與 SQL 版的差異：關鍵字中的 `%`、`_` 視為一般字元；排序依 Python 字串順序（同 C collation）。
+"""
+import bisect
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import queries
+import sampling
+
+logger = logging.getLogger(__name__)
+
+# 快照額外取得的衍生欄位（與 SQL 版使用相同的 CASE 運算式）
+SNAPSHOT_SQL = f"""
+    SELECT
+        {queries.select_list(queries.ROUTE_FIELDS, queries.SEARCH_FIELD_SQL)},
+        {queries.DISTRICT_KEY_SQL} AS "_district_key",
+        {queries.district_name_sql()} AS "_district_name",
+        {queries.district_name_sql("COALESCE(district, '未知')")} AS "_sample_district_name"
+    FROM dmv_routes_2025
+"""
+
+SEARCH_TEXT_FIELDS = ('路線名稱', '路線編號', '公司名稱')
+FIELD_SEP = '\x1f'
+ROW_SEP = '\x1e'
+
+
+class Snapshot:
+    """某一資料世代的唯讀快照"""
+
+    def __init__(self, generation, rows):
+        self.generation = generation
+        self.loaded_at = time.time()
+        self.size = len(rows)
+
+        columns = list(zip(*rows)) if rows else [()] * (len(queries.ROUTE_FIELDS) + 3)
+        names = queries.ROUTE_FIELDS + ['_district_key', '_district_name', '_sample_district_name']
+        values = {name: list(col) for name, col in zip(names, columns)}
+
+        # 輸出用的 Python 值（逐欄），/api/routes 的 district 為區分台北區/台北市區的代碼
+        self.values = values
+        self.routes_values = dict(values, district=values['_district_key'])
+
+        frame = pd.DataFrame({
+            'district': pd.Categorical(values['district']),
+            'route_type': pd.Categorical(values['route_type']),
+            'company': pd.Categorical(values['公司名稱']),
+            'route_no': pd.Series(values['路線編號'], dtype=object),
+            'district_key': pd.Categorical(values['_district_key']),
+            'district_name': pd.Categorical(values['_district_name']),
+            'sample_district_name': pd.Categorical(values['_sample_district_name']),
+            'freq': pd.to_numeric(pd.Series(values['班次一'], dtype=object), errors='coerce'),
+        })
+
+        self._build_filters(frame)
+        self._build_facets(values)
+        self._build_text_index(values)
+        self._build_aggregates(frame)
+
+    # ---- 建立索引 ----
+
+    def _build_filters(self, frame):
+        self.district_masks = {
+            value: (frame['district'] == value).to_numpy() for value in frame['district'].cat.categories
+        }
+        self.route_type_masks = {
+            value: (frame['route_type'] == value).to_numpy() for value in frame['route_type'].cat.categories
+        }
+        # 與 SQL 的 ORDER BY district, route_type, "路線編號" 相同，NULL 排最後
+        sort_frame = pd.DataFrame({
+            'district': frame['district'].astype(object),
+            'route_type': frame['route_type'].astype(object),
+            'route_no': frame['route_no'],
+        })
+        self.search_order = sort_frame.sort_values(
+            ['district', 'route_type', 'route_no'], na_position='last', kind='mergesort'
+        ).index.to_numpy()
+
+    def _build_facets(self, values):
+        # 各分面欄位的值代碼（NULL 為 -1），分面筆數以 bincount 計算
+        self.facet_codes = {}
+        for name in queries.FACET_FIELDS:
+            codes, uniques = pd.factorize(pd.Series(values[name], dtype=object))
+            self.facet_codes[name] = (codes, list(uniques))
+
+    def _build_text_index(self, values):
+        parts = []
+        starts = []
+        position = 0
+        for fields in zip(*(values[name] for name in SEARCH_TEXT_FIELDS)):
+            row_text = FIELD_SEP.join('' if v is None else str(v).lower() for v in fields) + ROW_SEP
+            starts.append(position)
+            parts.append(row_text)
+            position += len(row_text)
+        self.text_blob = ''.join(parts)
+        self.text_starts = starts
+
+    def _build_aggregates(self, frame):
+        self.route_stats = (
+            self.size,
+            int(frame['district'].nunique()),
+            int((frame['route_type'] == 'local_routes').sum()),
+            int((frame['route_type'] == 'hwy_routes').sum()),
+        )
+
+        with_district = frame[frame['district'].notna()]
+        grouped = with_district.groupby(['district_key', 'route_type'], observed=True, dropna=False)
+        stats = grouped.agg(route_count=('route_no', 'size'), company_count=('company', 'nunique'))
+        stats_rows = [(k[0], k[1], int(r.route_count), int(r.company_count))
+                      for k, r in stats.sort_index().iterrows()]
+        self.statistics = queries.build_statistics(stats_rows, int(frame['company'].nunique()))
+
+        with_company = frame[frame['company'].notna()]
+        detailed = with_company.groupby(['district_name', 'company', 'route_type'],
+                                        observed=True, dropna=False).size()
+        self.detailed_statistics = queries.build_detailed_statistics(
+            [(k[0], k[1], k[2], int(v)) for k, v in detailed.sort_index().items()])
+
+        # 抽樣用的班次一分布（/api/sample-table、抽樣方案試算，見 sampling.py）
+        histogram = pd.DataFrame({
+            'district_name': with_company['sample_district_name'],
+            'company': with_company['company'],
+            'route_type': with_company['route_type'],
+            'freq': with_company['freq'].fillna(0),
+        }).groupby(['district_name', 'company', 'route_type', 'freq'], observed=True, dropna=False).size()
+        self.histograms = sampling.Histograms(
+            [(k[0], k[1], k[2], k[3], int(v)) for k, v in histogram.sort_index().items()])
+
+    # ---- 查詢 ----
+
+    def _text_mask(self, term):
+        term = term.lower().replace(FIELD_SEP, '').replace(ROW_SEP, '')
+        mask = np.zeros(self.size, dtype=bool)
+        if not term:
+            mask[:] = True
+            return mask
+        blob, starts = self.text_blob, self.text_starts
+        pos = blob.find(term)
+        while pos != -1:
+            row = bisect.bisect_right(starts, pos) - 1
+            mask[row] = True
+            if row + 1 >= self.size:
+                break
+            pos = blob.find(term, starts[row + 1])
+        return mask
+
+    def facets(self, mask):
+        """符合條件的列在各分面欄位的筆數，格式同 queries.build_facets"""
+        result = {}
+        for name, (codes, uniques) in self.facet_codes.items():
+            selected = codes[mask]
+            counts = np.bincount(selected[selected >= 0], minlength=len(uniques))
+            values = {value: int(n) for value, n in zip(uniques, counts.tolist()) if n}
+            nulls = int((selected < 0).sum())
+            if nulls:
+                values[None] = nulls
+            result[name] = queries.sort_facet_counts(values)
+        return result
+
+    def search(self, district, route_type, search_term, page, per_page, fields, with_facets=False):
+        """回傳 (資料列, 總筆數, 分面筆數)，條件與排序同 queries.build_search_where / search_data_sql
+
+        with_facets 為 False 時分面筆數為 None。
+        """
+        mask = np.ones(self.size, dtype=bool)
+        if district:
+            mask &= self.district_masks.get(district, np.zeros(self.size, dtype=bool))
+        if route_type:
+            mask &= self.route_type_masks.get(route_type, np.zeros(self.size, dtype=bool))
+        if search_term:
+            mask &= self._text_mask(search_term)
+
+        hits = self.search_order[mask[self.search_order]]
+        offset = (page - 1) * per_page
+        page_hits = hits[offset:offset + per_page] if offset >= 0 and per_page > 0 else hits[:0]
+        facets = self.facets(mask) if with_facets else None
+        return self._rows(self.values, fields, page_hits), int(hits.size), facets
+
+    def routes(self, fields, limit):
+        return self._rows(self.routes_values, fields, range(min(limit, self.size)))
+
+    @staticmethod
+    def _rows(values, fields, indexes):
+        columns = [values[name] for name in fields]
+        return [tuple([column[i] for column in columns]) for i in indexes]
+
+
+class RouteSnapshot:
+    """依資料世代維護目前的快照"""
+
+    def __init__(self, engine, generation):
+        self.engine = engine
+        self.generation = generation
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.last_load_seconds = None
+
+    def _load(self, token):
+        start = time.perf_counter()
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(SNAPSHOT_SQL)).fetchall()
+        snapshot = Snapshot(token, rows)
+        self.last_load_seconds = time.perf_counter() - start
+        self.loads += 1
+        logger.info('路線快照已載入：%d 筆，%.3f 秒（世代 %s）', snapshot.size, self.last_load_seconds, token)
+        return snapshot
+
+    def get(self):
+        """回傳與目前資料世代一致的快照，世代改變時重建"""
+        token = self.generation.get()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.generation == token:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.generation != token:
+                snapshot = self._snapshot = self._load(token)
+            return snapshot
+
+    def status(self):
+        current = self._snapshot
+        return {
+            'loads': self.loads,
+            'last_load_seconds': self.last_load_seconds,
+            'rows': current.size if current else None,
+            'generation': current.generation if current else None,
+        }
+
+    def warm(self):
+        """於背景執行緒載入第一份快照，失敗時留待第一個請求重試"""
+        def run():
+            try:
+                self.get()
+            except Exception:
+                logger.exception('路線快照預先載入失敗')
+        threading.Thread(target=run, name='route-snapshot-warm', daemon=True).start()
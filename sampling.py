@@ -0,0 +1,351 @@
+"""抽樣引擎：班次一分布直方圖與抽樣方案試算
+
+原本 /api/sample-table 與 /export/sample-table.xlsx 把「班次一 <= 24 / >= 25」的切點與
+「a*1 + b*2」的權重寫死在 SQL 與 Python 中，想試另一個切點就得改程式並重新掃表。
+
+這裡改為一次掃描（GROUP BY 監理所、公司、路線類型、班次一）建立每個分層的班次一
+次數分布，依資料世代快取；任一切點與權重的路線數與樣本數都由直方圖的累積次數在
+記憶體中算出，不再查詢資料庫：
+- 分層 × 班次一 的次數矩陣，沿班次一累加；切點 t 以 searchsorted 找到欄位，
+  `<= t` 的路線數即該欄累積值，其餘為 `> t`（班次一為整數，與原本的 `>= t+1` 相同）
+- 多個方案（what-if）各只需一次向量運算
+
+啟用記憶體快照（`ROUTE_SNAPSHOT=1`）時，直方圖由快照建立，不另外查詢。
+
+抽出樣本（`draw`）：各分層再依切點分為班次一 `<= t`（low）與 `> t`（high）兩層，
+每層抽出 `ceil(rate × 路線數)` 條（至少 `min` 條、至多全部）。以 seed 產生每條路線的
+亂數鍵，依（層, 亂數鍵）排序後取每層前 n 條，一次向量運算完成；母體依固定欄位排序、
+最後以 id 決定同鍵路線的先後，同一資料世代、同一 seed 的結果完全相同。啟用記憶體快照時
+母體同樣由 POPULATION_SQL 載入，兩種模式的抽樣結果一致。
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import text
+
+import queries
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 24
+DEFAULT_WEIGHTS = (1, 2)
+MAX_PLANS = 50
+DEFAULT_RATE = 0.1
+DEFAULT_MIN_PER_STRATUM = 1
+DEFAULT_SEED = 2025
+
+ROUTE_TYPES = ('hwy_routes', 'local_routes')
+
+# 每個分層的班次一次數分布（班次一為 NULL 時視為 0，與原本的 COALESCE 相同）
+HISTOGRAM_SQL = f"""
+    SELECT s.district_name, c."公司名稱" as company, s.route_type, s.freq, s.route_count
+    FROM (
+        SELECT
+            {queries.district_name_sql("COALESCE(district, '未知')")} as district_name,
+            company_id,
+            route_type,
+            COALESCE("班次一", 0) as freq,
+            COUNT(*) as route_count
+        FROM dmv_routes_2025
+        WHERE company_id IS NOT NULL
+        GROUP BY district_name, company_id, route_type, freq
+    ) s
+    JOIN dmv_companies c ON c.company_id = s.company_id
+    ORDER BY s.district_name, company, s.route_type, s.freq
+"""
+
+# 抽樣母體：逐條路線，排序固定（最後以唯一的 id 排開同鍵路線），確保相同 seed 抽出相同路線
+POPULATION_SQL = f"""
+    SELECT
+        {queries.district_name_sql("COALESCE(district, '未知')")} as district_name,
+        "公司名稱",
+        route_type,
+        "路線編號",
+        "路線名稱",
+        "班次一"
+    FROM dmv_routes_2025
+    WHERE "公司名稱" IS NOT NULL
+    ORDER BY district_name, "公司名稱", route_type, "路線編號", "路線名稱", id
+"""
+POPULATION_FIELDS = ['district_name', '公司名稱', 'route_type', '路線編號', '路線名稱', '班次一']
+
+SamplingPlan = namedtuple('SamplingPlan', ['threshold', 'weights'])
+DEFAULT_PLAN = SamplingPlan(DEFAULT_THRESHOLD, DEFAULT_WEIGHTS)
+
+DrawSpec = namedtuple('DrawSpec', ['plan', 'rate', 'min_per_stratum', 'seed'])
+
+
+# ---- 參數解析 ----
+
+def _parse_threshold(raw):
+    try:
+        threshold = int(raw)
+    except (TypeError, ValueError):
+        raise queries.InvalidParameter(f'threshold 必須為整數：{raw}')
+    if threshold < 0:
+        raise queries.InvalidParameter(f'threshold 不可為負數：{raw}')
+    return threshold
+
+
+def _parse_weights(raw):
+    parts = [p.strip() for p in raw.split(',')]
+    try:
+        weights = tuple(int(p) for p in parts)
+    except ValueError:
+        raise queries.InvalidParameter(f'weights 必須為兩個整數，例如 1,2：{raw}')
+    if len(weights) != 2 or min(weights) < 0:
+        raise queries.InvalidParameter(f'weights 必須為兩個非負整數，例如 1,2：{raw}')
+    return weights
+
+
+def parse_plan(args):
+    """由 threshold= 與 weights= 取得抽樣方案，未指定時為 24 班次、1,2 權重"""
+    threshold = args.get('threshold', '').strip()
+    weights = args.get('weights', '').strip()
+    return SamplingPlan(
+        _parse_threshold(threshold) if threshold else DEFAULT_THRESHOLD,
+        _parse_weights(weights) if weights else DEFAULT_WEIGHTS,
+    )
+
+
+def parse_plans(args):
+    """解析可重複的 plan=門檻:權重1,權重2（例如 plan=24:1,2&plan=20:1,3）"""
+    raw_plans = [p for p in args.getlist('plan') if p.strip()]
+    if not raw_plans:
+        return [DEFAULT_PLAN]
+    if len(raw_plans) > MAX_PLANS:
+        raise queries.InvalidParameter(f'plan 最多 {MAX_PLANS} 個')
+    plans = []
+    for raw in raw_plans:
+        threshold, _, weights = raw.partition(':')
+        plans.append(SamplingPlan(
+            _parse_threshold(threshold.strip()),
+            _parse_weights(weights) if weights.strip() else DEFAULT_WEIGHTS,
+        ))
+    return plans
+
+
+def parse_draw(args):
+    """抽樣參數：threshold、weights（同 parse_plan）、rate、min、seed"""
+    plan = parse_plan(args)
+    raw_rate = args.get('rate', '').strip()
+    raw_min = args.get('min', '').strip()
+    raw_seed = args.get('seed', '').strip()
+    try:
+        rate = float(raw_rate) if raw_rate else DEFAULT_RATE
+    except ValueError:
+        raise queries.InvalidParameter(f'rate 必須為數字：{raw_rate}')
+    if not 0 < rate <= 1:
+        raise queries.InvalidParameter(f'rate 必須介於 0 與 1 之間（不含 0）：{raw_rate}')
+    try:
+        min_per_stratum = int(raw_min) if raw_min else DEFAULT_MIN_PER_STRATUM
+        seed = int(raw_seed) if raw_seed else DEFAULT_SEED
+    except ValueError:
+        raise queries.InvalidParameter('min 與 seed 必須為整數')
+    if min_per_stratum < 0 or seed < 0:
+        raise queries.InvalidParameter('min 與 seed 不可為負數')
+    return DrawSpec(plan, rate, min_per_stratum, seed)
+
+
+# ---- 直方圖 ----
+
+class Histograms:
+    """各分層（監理所中文名稱, 公司, 路線類型）的班次一次數分布"""
+
+    def __init__(self, rows):
+        """rows 為 (監理所, 公司, 路線類型, 班次一, 路線數)，分層依第一次出現的順序排列"""
+        strata = {}
+        stratum_index = []
+        freqs = []
+        counts = []
+        for district, company, route_type, freq, count in rows:
+            key = (district, company, route_type)
+            index = strata.get(key)
+            if index is None:
+                index = strata[key] = len(strata)
+            stratum_index.append(index)
+            freqs.append(freq)
+            counts.append(count)
+
+        self.strata = list(strata)
+        self.freqs, freq_index = np.unique(np.asarray(freqs, dtype=float), return_inverse=True)
+        matrix = np.zeros((len(self.strata), len(self.freqs)), dtype=np.int64)
+        np.add.at(matrix, (np.asarray(stratum_index, dtype=np.intp), freq_index),
+                  np.asarray(counts, dtype=np.int64))
+        self.cumulative = np.cumsum(matrix, axis=1)
+        self.totals = (self.cumulative[:, -1] if len(self.freqs)
+                       else np.zeros(len(self.strata), dtype=np.int64))
+
+        # 彙總用的分層代碼
+        self.districts = list(dict.fromkeys(s[0] for s in self.strata))
+        district_codes = {d: i for i, d in enumerate(self.districts)}
+        self.district_codes = np.array([district_codes[s[0]] for s in self.strata], dtype=np.intp)
+        self.route_type_codes = np.array(
+            [ROUTE_TYPES.index(s[2]) if s[2] in ROUTE_TYPES else -1 for s in self.strata], dtype=np.intp)
+
+    def split(self, threshold):
+        """回傳各分層 (班次一 <= threshold 的路線數, 其餘路線數)"""
+        column = np.searchsorted(self.freqs, threshold, side='right')
+        if column == 0:
+            low = np.zeros(len(self.strata), dtype=np.int64)
+        else:
+            low = self.cumulative[:, column - 1]
+        return low, self.totals - low
+
+    def rows(self, threshold):
+        """(監理所, 公司, 路線類型, 班次一 <= threshold 的路線數, 其餘路線數)，供 build_sample_table 使用"""
+        low, high = self.split(threshold)
+        return [(d, c, r, lo, hi)
+                for (d, c, r), lo, hi in zip(self.strata, low.tolist(), high.tolist())]
+
+    def evaluate(self, plan):
+        """試算單一方案：各路線類型與各監理所的路線數、樣本數"""
+        low, high = self.split(plan.threshold)
+        samples = low * plan.weights[0] + high * plan.weights[1]
+        result = {
+            'threshold': plan.threshold,
+            'weights': list(plan.weights),
+            'samples_total': int(samples.sum()),
+        }
+        for code, route_type in enumerate(ROUTE_TYPES):
+            selected = self.route_type_codes == code
+            result[route_type] = {
+                'low': int(low[selected].sum()),
+                'high': int(high[selected].sum()),
+                'samples': int(samples[selected].sum()),
+            }
+        by_district = np.bincount(self.district_codes, weights=samples, minlength=len(self.districts))
+        result['by_district'] = {d: int(v) for d, v in zip(self.districts, by_district.tolist())}
+        return result
+
+
+# ---- 抽出樣本 ----
+
+class Population:
+    """抽樣母體（逐條路線，依 POPULATION_SQL 的順序）"""
+
+    def __init__(self, rows):
+        columns = list(zip(*rows)) if rows else [()] * len(POPULATION_FIELDS)
+        self.values = {name: list(col) for name, col in zip(POPULATION_FIELDS, columns)}
+        self.size = len(rows)
+
+        strata = {}
+        codes = []
+        for key in zip(self.values['district_name'], self.values['公司名稱'], self.values['route_type']):
+            index = strata.get(key)
+            if index is None:
+                index = strata[key] = len(strata)
+            codes.append(index)
+        self.strata = list(strata)
+        self.stratum_codes = np.asarray(codes, dtype=np.intp)
+        # 班次一為 NULL 視為 0（與直方圖相同）
+        self.freq = np.array([0 if v is None else v for v in self.values['班次一']], dtype=float)
+
+    def draw(self, spec):
+        """依 spec 抽出樣本，回傳 (選中的列號, 各列所屬層, 各層母體數, 各層抽出數)"""
+        high = (self.freq > spec.plan.threshold).astype(np.intp)
+        layers = self.stratum_codes * 2 + high
+        layer_count = len(self.strata) * 2
+        sizes = np.bincount(layers, minlength=layer_count)
+        wanted = np.maximum(np.ceil(sizes * spec.rate), spec.min_per_stratum)
+        drawn = np.minimum(sizes, wanted).astype(np.int64)
+
+        keys = np.random.default_rng(spec.seed).random(self.size)
+        order = np.lexsort((keys, layers))
+        sorted_layers = layers[order]
+        rank = np.arange(self.size) - np.searchsorted(sorted_layers, sorted_layers, side='left')
+        selected = np.sort(order[rank < drawn[sorted_layers]])
+        return selected, layers, sizes, drawn
+
+    def sample(self, spec):
+        """抽出樣本並附上層資訊；samples 為該路線依權重計入的樣本數，design_weight 為母體數 / 抽出數"""
+        selected, layers, sizes, drawn = self.draw(spec)
+        values = self.values
+        routes = []
+        for i in selected.tolist():
+            layer = layers[i]
+            band = 'high' if layer % 2 else 'low'
+            size, count = int(sizes[layer]), int(drawn[layer])
+            routes.append({
+                'district_name': values['district_name'][i],
+                '公司名稱': values['公司名稱'][i],
+                'route_type': values['route_type'][i],
+                '路線編號': values['路線編號'][i],
+                '路線名稱': values['路線名稱'][i],
+                '班次一': values['班次一'][i],
+                'band': band,
+                'samples': spec.plan.weights[1 if band == 'high' else 0],
+                'stratum_size': size,
+                'stratum_drawn': count,
+                'design_weight': round(size / count, 4),
+            })
+        return {
+            'success': True,
+            'threshold': spec.plan.threshold,
+            'weights': list(spec.plan.weights),
+            'rate': spec.rate,
+            'min': spec.min_per_stratum,
+            'seed': spec.seed,
+            'population': self.size,
+            'strata': int(np.count_nonzero(sizes)),
+            'selected': len(routes),
+            'routes': routes,
+        }
+
+
+# ---- 依資料世代快取 ----
+
+class SamplingEngine:
+    """維護與目前資料世代一致的直方圖"""
+
+    def __init__(self, engine, generation, snapshot=None):
+        self.engine = engine
+        self.generation = generation
+        self.snapshot = snapshot
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.last_load_seconds = None
+
+    def _load(self, name, sql, build):
+        start = time.perf_counter()
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql)).fetchall()
+        value = build(rows)
+        self.last_load_seconds = time.perf_counter() - start
+        self.loads += 1
+        logger.info('抽樣資料（%s）已載入：%d 列，%.3f 秒', name, len(rows), self.last_load_seconds)
+        return value
+
+    def _cached(self, name, sql, build):
+        token = self.generation.get()
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == token:
+            return cached[1]
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is None or cached[0] != token:
+                cached = self._cache[name] = (token, self._load(name, sql, build))
+            return cached[1]
+
+    def histograms(self):
+        if self.snapshot is not None:
+            return self.snapshot.get().histograms
+        return self._cached('histograms', HISTOGRAM_SQL, Histograms)
+
+    def population(self):
+        return self._cached('population', POPULATION_SQL, Population)
+
+    def sample_table(self, plan=DEFAULT_PLAN):
+        """/api/sample-table 的回應內容"""
+        return queries.build_sample_table(self.histograms().rows(plan.threshold), plan.weights)
+
+    def compare(self, plans):
+        histograms = self.histograms()
+        return {'success': True, 'plans': [histograms.evaluate(plan) for plan in plans]}
+
+    def draw(self, spec):
+        return self.population().sample(spec)
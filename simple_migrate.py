@@ -24,7 +24,7 @@ def migrate_to_sqlite():
         pg_cursor = pg_conn.cursor()
         pg_cursor.execute("""
             SELECT 
-                district, route_type, source_file, "公司名稱", "路線編號", "路線名稱",
+                id, district, route_type, source_file, "公司名稱", company_id, "路線編號", "路線名稱",
                 "里程往", "里程返", "班次一", "班次二", "班次三", "班次四", "班次五", "班次六", "班次日",
                 "站牌數往", "站牌數返", "車輛數", "補貼_路線", "聯營業者", "路線性質"
             FROM dmv_routes_2025
@@ -40,11 +40,12 @@ def migrate_to_sqlite():
         
         sqlite_cursor.execute("""
             CREATE TABLE dmv_routes_2025 (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id INTEGER PRIMARY KEY,
                 district TEXT,
                 route_type TEXT,
                 source_file TEXT,
                 "公司名稱" TEXT,
+                company_id INTEGER,
                 "路線編號" TEXT,
                 "路線名稱" TEXT,
                 "里程往" REAL,
@@ -65,13 +66,13 @@ def migrate_to_sqlite():
             )
         """)
         
-        # 插入資料
+        # 插入資料（保留原 id，dmv_route_operators 以 id 參照路線）
         insert_sql = """
             INSERT INTO dmv_routes_2025 (
-                district, route_type, source_file, "公司名稱", "路線編號", "路線名稱",
+                id, district, route_type, source_file, "公司名稱", company_id, "路線編號", "路線名稱",
                 "里程往", "里程返", "班次一", "班次二", "班次三", "班次四", "班次五", "班次六", "班次日",
                 "站牌數往", "站牌數返", "車輛數", "補貼_路線", "聯營業者", "路線性質"
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         
         # 處理每一行資料，轉換 Decimal 類型
@@ -88,6 +89,43 @@ def migrate_to_sqlite():
             processed_rows.append(tuple(processed_row))
         
         sqlite_cursor.executemany(insert_sql, processed_rows)
+
+        # 公司維度表（統計依 company_id 彙總）
+        pg_cursor.execute('SELECT company_id, "公司名稱", name_key FROM dmv_companies')
+        sqlite_cursor.execute("DROP TABLE IF EXISTS dmv_companies")
+        sqlite_cursor.execute("""
+            CREATE TABLE dmv_companies (
+                company_id INTEGER PRIMARY KEY,
+                "公司名稱" TEXT NOT NULL UNIQUE,
+                name_key TEXT NOT NULL UNIQUE
+            )
+        """)
+        sqlite_cursor.executemany("INSERT INTO dmv_companies VALUES (?, ?, ?)", pg_cursor.fetchall())
+
+        # 公司別名表（依業者查路線時以原始寫法比對）
+        pg_cursor.execute('SELECT alias, company_id FROM dmv_company_aliases')
+        sqlite_cursor.execute("DROP TABLE IF EXISTS dmv_company_aliases")
+        sqlite_cursor.execute("""
+            CREATE TABLE dmv_company_aliases (
+                alias TEXT PRIMARY KEY,
+                company_id INTEGER NOT NULL REFERENCES dmv_companies (company_id)
+            )
+        """)
+        sqlite_cursor.executemany("INSERT INTO dmv_company_aliases VALUES (?, ?)", pg_cursor.fetchall())
+
+        # 路線 ↔ 業者關聯表（/api/operators/<name>/routes）
+        pg_cursor.execute('SELECT company_id, route_id, role FROM dmv_route_operators')
+        sqlite_cursor.execute("DROP TABLE IF EXISTS dmv_route_operators")
+        sqlite_cursor.execute("""
+            CREATE TABLE dmv_route_operators (
+                company_id INTEGER NOT NULL REFERENCES dmv_companies (company_id),
+                route_id INTEGER NOT NULL REFERENCES dmv_routes_2025 (id),
+                role TEXT NOT NULL CHECK (role IN ('operator', 'joint')),
+                PRIMARY KEY (company_id, route_id)
+            )
+        """)
+        sqlite_cursor.execute("CREATE INDEX idx_dmv_route_operators_route ON dmv_route_operators (route_id)")
+        sqlite_cursor.executemany("INSERT INTO dmv_route_operators VALUES (?, ?, ?)", pg_cursor.fetchall())
         sqlite_conn.commit()
         
         # 驗證結果
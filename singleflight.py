@@ -0,0 +1,233 @@
+"""相同請求的合併執行（single-flight）
+
+會議開始時數十個瀏覽器在同一秒請求 `/api/detailed-statistics`、`/api/sample-table`，
+每個請求各自對資料庫執行相同的分組查詢。這裡讓同時進行的相同請求（資料世代、路徑與
+查詢參數皆相同，鍵與 ETag 相同）只執行一次端點，其餘請求等待並共用同一份回應。
+
+- 行程內：第一個請求（leader）執行端點，其他執行緒等待其完成後取用結果；
+  leader 拋出例外時，等待者收到同一個例外
+- 跨 worker（可選，`SINGLEFLIGHT_DIR`）：leader 另以該目錄下的鎖定檔（O_EXCL 建立，
+  Windows 亦可用）與其他 worker 協調，只有取得鎖定者執行，其餘 worker 等待後讀取
+  寫入目錄的結果檔；結果檔只保留 `SINGLEFLIGHT_TTL` 秒，只涵蓋同一波請求。結果檔為
+  一行 JSON（狀態碼與標頭）加上原始回應本文，不以 pickle 保存；目錄權限設為 0700
+
+環境變數：
+- `SINGLEFLIGHT`：設為 `0` 可停用（預設 1）
+- `SINGLEFLIGHT_DIR`：跨 worker 協調用的目錄（預設不使用，只合併行程內的請求）
+- `SINGLEFLIGHT_TTL`：結果檔有效秒數（預設 2）
+- `SINGLEFLIGHT_WAIT`：等待其他 worker 的最長秒數，逾時即自行執行；
+  同時也是鎖定檔視為遺留（worker 中斷）的時間（預設 30）
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import Response, make_response
+
+import http_cache
+
+logger = logging.getLogger(__name__)
+
+SINGLEFLIGHT_ENABLED = os.getenv('SINGLEFLIGHT', '1') == '1'
+SINGLEFLIGHT_DIR = os.getenv('SINGLEFLIGHT_DIR', '')
+SINGLEFLIGHT_TTL = float(os.getenv('SINGLEFLIGHT_TTL', '2'))
+SINGLEFLIGHT_WAIT = float(os.getenv('SINGLEFLIGHT_WAIT', '30'))
+
+POLL_SECONDS = 0.05
+SWEEP_INTERVAL = 60
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """以鍵合併同時進行的相同計算"""
+
+    def __init__(self, directory=SINGLEFLIGHT_DIR, ttl=SINGLEFLIGHT_TTL, wait=SINGLEFLIGHT_WAIT):
+        self.directory = directory or None
+        self.ttl = ttl
+        self.wait = wait
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.stats = {'leaders': 0, 'shared': 0, 'peer_results': 0, 'wait_timeouts': 0}
+        if self.directory:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            try:
+                os.chmod(self.directory, 0o700)
+            except OSError as e:
+                logger.warning('無法將 %s 設為 0700，停用跨 worker 合併：%s', self.directory, e)
+                self.directory = None
+
+    def do(self, key, fn, persist=None):
+        """執行 fn() 或等待同鍵進行中的呼叫並共用其結果
+
+        persist(result) 為真時結果才寫入跨 worker 的結果檔（例如只保存成功的回應）；
+        跨 worker 模式下 fn() 須回傳 (狀態碼, 標頭清單, 本文 bytes)。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats['leaders'] += 1
+            else:
+                self.stats['shared'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.directory:
+                call.result = self._run_across_workers(key, fn, persist)
+            else:
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def status(self):
+        with self._lock:
+            return dict(self.stats, enabled=SINGLEFLIGHT_ENABLED, directory=self.directory,
+                        in_flight=len(self._calls))
+
+    # ---- 跨 worker ----
+
+    def _paths(self, key):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, name)
+        return base + '.lock', base + '.result'
+
+    def _read_fresh(self, result_path):
+        try:
+            if time.time() - os.path.getmtime(result_path) > self.ttl:
+                return None
+            with open(result_path, 'rb') as f:
+                return _load_result(f.read())
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _acquire(self, lock_path, result_path):
+        """取得鎖定檔；回傳 (是否取得, 其他 worker 剛寫入的結果或 None)"""
+        deadline = time.monotonic() + self.wait
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                # 取得鎖定前可能有 worker 剛完成，再檢查一次結果檔
+                result = self._read_fresh(result_path)
+                if result is not None:
+                    os.remove(lock_path)
+                return True, result
+            except FileExistsError:
+                pass
+            result = self._read_fresh(result_path)
+            if result is not None:
+                return False, result
+            try:
+                if time.time() - os.path.getmtime(lock_path) > self.wait:
+                    logger.warning('移除遺留的 single-flight 鎖定檔：%s', lock_path)
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() > deadline:
+                with self._lock:
+                    self.stats['wait_timeouts'] += 1
+                return False, None
+            time.sleep(POLL_SECONDS)
+
+    def _run_across_workers(self, key, fn, persist):
+        lock_path, result_path = self._paths(key)
+        acquired, result = self._acquire(lock_path, result_path)
+        if result is not None:
+            with self._lock:
+                self.stats['peer_results'] += 1
+            return result
+        try:
+            result = fn()
+            if persist is None or persist(result):
+                tmp_path = f'{result_path}.{os.getpid()}.{threading.get_ident()}'
+                with open(tmp_path, 'wb') as f:
+                    f.write(_dump_result(result))
+                os.replace(tmp_path, result_path)
+            return result
+        finally:
+            if acquired:
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+            self._sweep()
+
+    def _sweep(self):
+        """清除過期的結果檔（每 SWEEP_INTERVAL 秒最多一次）"""
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.result') and now - entry.stat().st_mtime > max(self.ttl, SWEEP_INTERVAL):
+                    os.remove(entry.path)
+        except OSError:
+            logger.exception('清除 single-flight 結果檔失敗')
+
+
+def _dump_result(result):
+    """結果檔格式：第一行為 JSON（狀態碼與標頭），其後為原始本文"""
+    status, headers, body = result
+    head = json.dumps({'status': status, 'headers': [[k, v] for k, v in headers]}, ensure_ascii=False)
+    return head.encode('utf-8') + b'\n' + body
+
+
+def _load_result(data):
+    head, sep, body = data.partition(b'\n')
+    if not sep:
+        raise ValueError('結果檔格式不正確')
+    meta = json.loads(head.decode('utf-8'))
+    return int(meta['status']), [(str(k), str(v)) for k, v in meta['headers']], body
+
+
+def coalesce(flights, generation):
+    """端點裝飾器：資料世代、路徑與查詢參數相同的同時請求只執行一次端點
+
+    共用的是序列化後的回應內容（狀態碼、標頭、本文），每個請求各自建立 Response，
+    之後的壓縮等處理照常進行。只用於回應 JSON 的端點（檔案串流無法共用）。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not SINGLEFLIGHT_ENABLED:
+                return view(*args, **kwargs)
+            try:
+                key = http_cache.make_etag(generation.get())
+            except Exception:
+                # 取不到資料世代時不合併，交由端點本身回報錯誤
+                return view(*args, **kwargs)
+
+            def run():
+                response = make_response(view(*args, **kwargs))
+                return response.status_code, list(response.headers.items()), response.get_data()
+
+            status, headers, body = flights.do(key, run, persist=lambda result: result[0] == 200)
+            return Response(body, status=status, headers=headers)
+        return wrapper
+    return decorator
@@ -0,0 +1,103 @@
+"""慢查詢記錄（可選）
+
+設定 `SLOW_QUERY_MS` 後，執行時間超過門檻的 SQL 會寫入輪替記錄檔（每行一筆 JSON），
+內容包含：耗時、來源端點、SQL、綁定參數，以及 PostgreSQL 的
+`EXPLAIN (ANALYZE, BUFFERS)` 執行計畫，方便找出循序掃描與計畫退化。
+
+環境變數：
+- `SLOW_QUERY_MS`：門檻毫秒數，未設定或 0 表示停用
+- `SLOW_QUERY_LOG`：記錄檔路徑（預設 `slow_query.log`）
+- `SLOW_QUERY_LOG_MAX_BYTES`、`SLOW_QUERY_LOG_BACKUPS`：輪替大小（預設 10MB）與保留份數（預設 5）
+- `SLOW_QUERY_EXPLAIN`：設為 `0` 只記錄 SQL 不取執行計畫（EXPLAIN ANALYZE 會再執行一次該查詢）
+"""
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+import metrics
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '0') or 0)
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'slow_query.log')
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '5'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', '1') == '1'
+
+logger = logging.getLogger('slow_query')
+
+
+def _setup_logger():
+    if logger.handlers:
+        return
+    handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                                  backupCount=SLOW_QUERY_LOG_BACKUPS, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def _is_explainable(statement):
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+    return head in ('SELECT', 'WITH')
+
+
+def explain(conn, statement, parameters):
+    """在同一條連線以 SAVEPOINT 包住 EXPLAIN，失敗時不影響原交易"""
+    dbapi_conn = conn.connection.dbapi_connection
+    in_transaction = not getattr(dbapi_conn, 'autocommit', False)
+    cursor = dbapi_conn.cursor()
+    try:
+        if in_transaction:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + statement, parameters)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        except Exception as e:
+            if in_transaction:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return f'EXPLAIN 失敗：{e}'
+        if in_transaction:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        return plan
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slow_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._slow_query_start) * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+
+    record = {
+        'time': datetime.now().astimezone().isoformat(timespec='seconds'),
+        'duration_ms': round(elapsed_ms, 2),
+        'endpoint': metrics.current_endpoint(),
+        'statement': statement,
+        'parameters': parameters,
+    }
+    if (SLOW_QUERY_EXPLAIN and not executemany
+            and conn.dialect.name == 'postgresql' and _is_explainable(statement)):
+        try:
+            record['plan'] = explain(conn, statement, parameters)
+        except Exception as e:
+            record['plan'] = f'EXPLAIN 失敗：{e}'
+    logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def install(engine):
+    """SLOW_QUERY_MS > 0 時為 engine 掛上慢查詢記錄"""
+    if SLOW_QUERY_MS <= 0:
+        return False
+    _setup_logger()
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    return True
@@ -4,6 +4,10 @@ let totalPages = 1;
 let currentData = [];
 let allData = [];
 
+// 路線表格實際顯示的欄位（向後端只要求這些欄位）
+const DISPLAY_FIELDS = ['district', 'route_type', '公司名稱', '路線編號', '路線名稱',
+    '里程往', '里程返', '班次一', '車輛數', '站牌數往'];
+
 // 頁面載入時初始化
 document.addEventListener('DOMContentLoaded', function() {
     console.log('DOM載入完成，開始初始化...');
@@ -31,15 +35,60 @@ function setupEventListeners() {
         }
     });
     
+    document.getElementById('search-input').addEventListener('input', scheduleSuggestions);
+    
     document.getElementById('district-filter').addEventListener('change', searchRoutes);
     document.getElementById('route-type-filter').addEventListener('change', searchRoutes);
 }
 
+// 搜尋建議（/api/suggest，由後端記憶體索引回應）
+const SUGGEST_TYPE_NAMES = { route_no: '路線編號', route_name: '路線名稱', company: '公司' };
+let suggestTimer = null;
+let suggestController = null;
+
+function scheduleSuggestions() {
+    clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(loadSuggestions, 120);
+}
+
+async function loadSuggestions() {
+    const query = document.getElementById('search-input').value.trim();
+    const datalist = document.getElementById('search-suggestions');
+    if (!query) {
+        datalist.replaceChildren();
+        return;
+    }
+    // 只保留最後一次輸入的請求
+    if (suggestController) {
+        suggestController.abort();
+    }
+    suggestController = new AbortController();
+    try {
+        const params = new URLSearchParams({ q: query, limit: 10 });
+        const res = await fetch(`/api/suggest?${params}`, { signal: suggestController.signal });
+        const data = await res.json();
+        if (!data.success) {
+            return;
+        }
+        datalist.replaceChildren(...data.suggestions.map(s => {
+            const option = document.createElement('option');
+            option.value = s.text;
+            option.label = `${SUGGEST_TYPE_NAMES[s.type] || s.type}（${s.count}）`;
+            return option;
+        }));
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('載入搜尋建議錯誤:', error);
+        }
+    }
+}
+
 // 載入路線資料
 async function loadRouteData() {
     try {
         console.log('開始載入資料...');
-        const response = await fetch('/api/routes');
+        const params = new URLSearchParams({ format: 'columnar', fields: DISPLAY_FIELDS.join(',') });
+        const response = await fetch(`/api/routes?${params}`);
         console.log('API回應狀態:', response.status);
         
         if (!response.ok) {
@@ -53,7 +102,7 @@ async function loadRouteData() {
             throw new Error(data.error || '後端回傳錯誤');
         }
         
-        allData = data.routes;
+        allData = data.format === 'columnar' ? expandColumnar(data.routes) : data.routes;
         currentData = allData;
         
         updateStatistics(data.statistics);
@@ -65,6 +114,21 @@ async function loadRouteData() {
     }
 }
 
+// 將列式格式（columns + rows + dictionaries）還原為逐筆物件
+function expandColumnar(payload) {
+    const columns = payload.columns || [];
+    const dictionaries = payload.dictionaries || {};
+    const lookups = columns.map(col => dictionaries[col]);
+    return (payload.rows || []).map(values => {
+        const route = {};
+        for (let i = 0; i < columns.length; i++) {
+            const lookup = lookups[i];
+            route[columns[i]] = lookup ? lookup[values[i]] : values[i];
+        }
+        return route;
+    });
+}
+
 // 更新統計資訊
 function updateStatistics(stats) {
     document.getElementById('total-routes').textContent = stats.total || 0;
@@ -0,0 +1,159 @@
+"""搜尋建議（typeahead）索引
+
+`/api/suggest` 於每次按鍵時呼叫，不能對資料庫做前後萬用字元的 ILIKE 掃描。這裡把
+路線編號、路線名稱、公司名稱的相異值（含出現次數）載入記憶體，建立：
+- 前綴索引：小寫排序後的字串陣列，以 bisect 找出前綴範圍；1～2 字元的前綴另預先
+  保存排名最前的詞，避免短前綴掃過大範圍
+- n-gram 索引：每個字元與相鄰兩字元對應的詞代碼清單，供中間比對（例如輸入「臺中」
+  找到「斗六－臺中」）
+
+詞依出現次數由多到少配發代碼，代碼越小排名越前，因此各清單依代碼順序走訪即為排名
+順序，取滿筆數即可停止。索引依資料世代（見 `data_generation.py`）在匯入後重建。
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+import queries
+
+logger = logging.getLogger(__name__)
+
+# (建議類型, 欄位)
+SUGGEST_SOURCES = [
+    ('route_no', '路線編號'),
+    ('route_name', '路線名稱'),
+    ('company', '公司名稱'),
+]
+
+SUGGEST_SQL = ' UNION ALL '.join(
+    f'SELECT \'{kind}\', "{column}", COUNT(*) FROM dmv_routes_2025 '
+    f'WHERE "{column}" IS NOT NULL GROUP BY "{column}"'
+    for kind, column in SUGGEST_SOURCES
+)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+SHORT_PREFIX = 2
+
+
+class SuggestIndex:
+    """某一資料世代的建議索引"""
+
+    def __init__(self, generation, rows):
+        self.generation = generation
+        self.loaded_at = time.time()
+
+        # 依出現次數（多到少）、文字排序後配發代碼
+        terms = sorted(((str(value), kind, int(count)) for kind, value, count in rows if str(value).strip()),
+                       key=lambda t: (-t[2], t[0], t[1]))
+        self.terms = terms
+        self.keys = [value.lower() for value, _, _ in terms]
+
+        order = sorted(range(len(terms)), key=self.keys.__getitem__)
+        self.sorted_keys = [self.keys[i] for i in order]
+        self.sorted_ids = order
+
+        self.short_prefixes = {}
+        self.grams = {}
+        for term_id, key in enumerate(self.keys):
+            for length in range(1, SHORT_PREFIX + 1):
+                if len(key) >= length:
+                    top = self.short_prefixes.setdefault(key[:length], [])
+                    if len(top) < MAX_LIMIT:
+                        top.append(term_id)
+            for gram in {key[i:i + n] for n in (1, 2) for i in range(len(key) - n + 1)}:
+                self.grams.setdefault(gram, []).append(term_id)
+
+    @property
+    def size(self):
+        return len(self.terms)
+
+    def _prefix_ids(self, query, limit):
+        if len(query) <= SHORT_PREFIX:
+            return self.short_prefixes.get(query, [])[:limit]
+        lo = bisect.bisect_left(self.sorted_keys, query)
+        hi = bisect.bisect_left(self.sorted_keys, query + '\U0010ffff')
+        return heapq.nsmallest(limit, self.sorted_ids[lo:hi])
+
+    def _infix_ids(self, query, limit, exclude):
+        grams = [query] if len(query) == 1 else [query[i:i + 2] for i in range(len(query) - 1)]
+        postings = [self.grams.get(g) for g in grams]
+        if not all(postings):
+            return []
+        found = []
+        for term_id in min(postings, key=len):
+            if term_id not in exclude and query in self.keys[term_id]:
+                found.append(term_id)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """前綴相符者優先，再以中間相符者補足；同類依出現次數排序"""
+        query = query.strip().lower()
+        if not query:
+            return []
+        ids = self._prefix_ids(query, limit)
+        if len(ids) < limit:
+            ids = ids + self._infix_ids(query, limit - len(ids), set(ids))
+        return [{'text': self.terms[i][0], 'type': self.terms[i][1], 'count': self.terms[i][2]} for i in ids]
+
+
+class Suggester:
+    """依資料世代維護目前的建議索引"""
+
+    def __init__(self, engine, generation):
+        self.engine = engine
+        self.generation = generation
+        self._index = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.last_load_seconds = None
+
+    def _load(self, token):
+        start = time.perf_counter()
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(SUGGEST_SQL)).fetchall()
+        index = SuggestIndex(token, rows)
+        self.last_load_seconds = time.perf_counter() - start
+        self.loads += 1
+        logger.info('搜尋建議索引已建立：%d 個詞，%.3f 秒（世代 %s）', index.size, self.last_load_seconds, token)
+        return index
+
+    def get(self):
+        token = self.generation.get()
+        index = self._index
+        if index is not None and index.generation == token:
+            return index
+        with self._lock:
+            index = self._index
+            if index is None or index.generation != token:
+                index = self._index = self._load(token)
+            return index
+
+    def status(self):
+        current = self._index
+        return {
+            'loads': self.loads,
+            'last_load_seconds': self.last_load_seconds,
+            'terms': current.size if current else None,
+            'generation': current.generation if current else None,
+        }
+
+    def warm(self):
+        """於背景執行緒建立第一份索引，失敗時留待第一個請求重試"""
+        def run():
+            try:
+                self.get()
+            except Exception:
+                logger.exception('搜尋建議索引預先建立失敗')
+        threading.Thread(target=run, name='suggest-warm', daemon=True).start()
+
+
+def parse_limit(args):
+    """limit 預設 10、最多 50"""
+    return queries.parse_limit(args, DEFAULT_LIMIT, MAX_LIMIT)
@@ -0,0 +1,167 @@
+"""合成路線資料產生器（效能測試用）
+
+依 114 年實際資料（11 個活頁簿、527 條路線、48 家業者）的分布，
+產生任意倍數規模的 `dmv_routes_2025` 資料：
+- 各監理所 × 路線類型的路線數比例與實際相同
+- 業者路線數呈長尾分布，國道業者跨監理所重複出現；業者家數隨規模平方根成長
+- 班次一為對數常態分布（中位數約 10，約 83% 在 24 班次以下），里程、站牌數、車輛數亦同
+- 約 11% 路線有聯營業者
+
+可直接載入資料庫（`load_table`），或輸出與原始檔相同命名與表頭的 xlsx（`write_workbooks`），
+供匯入程式的各階段測試使用。
+"""
+import importlib
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+importer = importlib.import_module('公路總局客運資料匯入')
+
+BASE_ROUTE_COUNT = 527
+
+# (監理所前綴, district, route_type, 檔名, 實際路線數)
+FILE_LAYOUT = [
+    ('臺北區監理所', 'taipei', 'hwy_routes', '臺北區監理所114年路線資料 _國道客運路線.xlsx', 112),
+    ('臺北區監理所', 'taipei', 'local_routes', '臺北區監理所114年路線資料 _一般公路客運路線.xlsx', 31),
+    ('臺北市區監理所', 'taipei', 'hwy_routes', '臺北市區監理所114年路線資料_國道客運路線.xlsx', 14),
+    ('臺北市區監理所', 'taipei', 'local_routes', '臺北市區監理所114年路線資料_一般公路客運路線.xlsx', 1),
+    ('新竹區監理所', 'hsinchu', 'hwy_routes', '新竹區監理所114年路線資料_國道客運路線.xlsx', 10),
+    ('新竹區監理所', 'hsinchu', 'local_routes', '新竹區監理所114年路線資料_一般公路客運路線.xlsx', 54),
+    ('臺中區監理所', 'taichung', 'hwy_routes', '臺中區監理所114年路線資料_國道客運路線.xlsx', 8),
+    ('臺中區監理所', 'taichung', 'local_routes', '臺中區監理所114年路線資料_一般公路客運路線.xlsx', 102),
+    ('嘉義區監理所', 'chiayi', 'hwy_routes', '嘉義區監理所114年路線資料_國道客運路線.xlsx', 13),
+    ('嘉義區監理所', 'chiayi', 'local_routes', '嘉義區監理所114年路線資料_一般公路客運路線.xlsx', 98),
+    ('高雄區監理所', 'kaohsiung', 'local_routes', '高雄區監理所114年路線資料_一般客運路線.xlsx', 84),
+]
+
+PLACES = ['臺北', '板橋', '桃園', '中壢', '新竹', '竹北', '苗栗', '臺中', '豐原', '彰化', '員林', '南投',
+          '斗六', '嘉義', '朴子', '臺南', '新營', '高雄', '鳳山', '屏東', '宜蘭', '羅東', '花蓮', '臺東',
+          '基隆', '淡水', '麥寮', '北港', '西螺', '埔里', '日月潭', '墾丁', '桃園機場', '清泉崗']
+
+COMPANY_PREFIXES = ['國光', '統聯', '和欣', '豪泰', '阿羅哈', '建明', '飛狗', '葛瑪蘭', '首都', '大有',
+                    '亞通', '中壢', '桃園', '新竹', '苗栗', '豐原', '台中', '仁友', '員林', '彰化',
+                    '南投', '臺西', '嘉義', '興南', '府城', '漢程', '高雄', '義大', '屏東', '東台灣']
+
+# 原始活頁簿的表頭（含換行與空白變體），寫 xlsx 時使用
+RAW_HEADERS = {
+    '補貼_路線': '補貼\n路線',
+    '路線性質': '路線性質\n(機場/一般)',
+}
+
+TABLE_COLUMNS = importer.required_columns + ['district', 'route_type', 'source_file', 'imported_at']
+
+
+def _companies(rng, n, offset=0):
+    names = []
+    for i in range(n):
+        prefix = COMPANY_PREFIXES[(offset + i) % len(COMPANY_PREFIXES)]
+        round_no = (offset + i) // len(COMPANY_PREFIXES)
+        names.append(f'{prefix}客運' if round_no == 0 else f'{prefix}{round_no + 1}客運')
+    return names
+
+
+def _zipf_choice(rng, names, size, a=1.1):
+    weights = 1.0 / np.arange(1, len(names) + 1) ** a
+    return rng.choice(np.array(names, dtype=object), size=size, p=weights / weights.sum())
+
+
+def _lognormal_int(rng, median, sigma, size, low=0, high=None):
+    values = np.rint(rng.lognormal(math.log(median), sigma, size))
+    return np.clip(values, low, high).astype(int)
+
+
+def generate_routes(scale, seed=42, imported_at='2025-09-19 09:55:00+0800'):
+    """產生約 527 × scale 筆、欄位與匯入後資料表相同的 DataFrame"""
+    rng = np.random.default_rng(seed)
+    company_factor = max(1.0, math.sqrt(scale))
+    # 國道業者全國共用（跨監理所重複），一般公路業者各區自有
+    national = _companies(rng, int(round(12 * company_factor)))
+    frames = []
+    offset = len(national)
+
+    for i, (office, district, route_type, source_file, base_count) in enumerate(FILE_LAYOUT):
+        n = max(1, int(round(base_count * scale)))
+        if route_type == 'hwy_routes':
+            pool = national
+        else:
+            local_count = max(1, int(round(6 * company_factor)))
+            pool = _companies(rng, local_count, offset)
+            offset += local_count
+
+        companies = _zipf_choice(rng, pool, n)
+        hwy = route_type == 'hwy_routes'
+        freq = _lognormal_int(rng, 10, 0.92, n, high=300)
+        start = (1000 if hwy else 7000) + i * 100000
+        places = np.array(PLACES, dtype=object)
+
+        df = pd.DataFrame({
+            '公司名稱': companies,
+            '路線編號': [str(start + k) for k in range(n)],
+            '路線名稱': rng.choice(places, n) + '－' + rng.choice(places, n),
+            '里程往': np.round(rng.lognormal(math.log(150 if hwy else 30), 0.6, n), 2),
+            '班次一': freq,
+            '班次二': np.maximum(freq + rng.integers(-2, 3, n), 0),
+            '班次三': np.maximum(freq + rng.integers(-2, 3, n), 0),
+            '班次四': np.maximum(freq + rng.integers(-2, 3, n), 0),
+            '班次五': np.maximum(freq + rng.integers(-2, 3, n), 0),
+            '班次六': np.maximum(freq - rng.integers(0, 4, n), 0),
+            '班次日': np.maximum(freq - rng.integers(0, 5, n), 0),
+            '站牌數往': _lognormal_int(rng, 30, 0.7, n, low=2),
+            '車輛數': _lognormal_int(rng, 4, 1.0, n, low=1),
+        })
+        df['里程返'] = np.round(df['里程往'] * rng.uniform(0.9, 1.1, n), 2)
+        df['站牌數返'] = np.maximum(df['站牌數往'] + rng.integers(-3, 4, n), 2)
+
+        if hwy:
+            df['補貼_路線'] = None
+            df['路線性質'] = rng.choice(np.array(['一般路線', '機場路線', '一般'], dtype=object), n,
+                                    p=[0.84, 0.08, 0.08])
+        else:
+            df['補貼_路線'] = rng.choice(np.array(['是', '否'], dtype=object), n, p=[0.75, 0.25])
+            df['路線性質'] = None
+
+        # 約 11% 路線有 1~2 家聯營業者
+        joint = np.full(n, None, dtype=object)
+        for k in np.flatnonzero(rng.random(n) < 0.11):
+            partners = rng.choice(np.array(pool, dtype=object), size=min(len(pool), rng.integers(1, 3)),
+                                  replace=False)
+            joint[k] = '、'.join([companies[k]] + [p for p in partners if p != companies[k]])
+        df['聯營業者'] = joint
+
+        df['district'] = district
+        df['route_type'] = route_type
+        df['source_file'] = source_file
+        df['imported_at'] = imported_at
+        frames.append(df)
+
+    return pd.concat(frames, ignore_index=True)[TABLE_COLUMNS]
+
+
+def load_table(engine, df):
+    """以匯入程式的資料表定義重建 dmv_routes_2025（含公司維度表）、批次寫入後建立索引"""
+    importer.create_table_with_proper_types(df, importer.TARGET_TABLE, engine)
+    companies = importer.CompanyRegistry()
+    df = companies.assign(df.copy())
+    companies.flush(engine)
+    method = 'multi' if engine.dialect.name == 'postgresql' else None
+    df.to_sql(importer.TARGET_TABLE, engine, if_exists='append', index=False,
+              chunksize=1000, method=method)
+    importer.build_route_operators(engine, companies)
+    importer.create_indexes(engine, importer.TARGET_TABLE)
+
+
+def write_workbooks(df, folder):
+    """依 source_file 拆成與原始資料相同命名、相同表頭格式的 xlsx，回傳檔案路徑清單"""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for source_file, part in df.groupby('source_file', sort=False):
+        sheet = part[importer.required_columns[:17]].rename(columns=RAW_HEADERS)
+        if '國道' in source_file:
+            sheet = sheet.drop(columns=[RAW_HEADERS['補貼_路線']])
+            sheet.insert(12, RAW_HEADERS['路線性質'], part['路線性質'].values)
+        path = os.path.join(folder, source_file)
+        sheet.to_excel(path, index=False, sheet_name='工作表1')
+        paths.append(path)
+    return paths